@@ -0,0 +1,122 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+class AdmissionController:
+    # Gate in front of the UI handlers. Expensive (LLM-bound) requests wait in per-session
+    # queues served round-robin, so one user submitting many runs cannot starve the others;
+    # cheap handlers get their own limit and never queue behind expensive ones
+    def __init__(self, max_concurrency=8, max_queue=64, cheap_concurrency=32, cheap_timeout_seconds=5,
+                 initial_service_seconds=30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.cheap_timeout_seconds = cheap_timeout_seconds
+        self._queues = OrderedDict()
+        self._running = 0
+        self._service_seconds = initial_service_seconds
+        self._cheap = threading.BoundedSemaphore(cheap_concurrency)
+
+    @property
+    def waiting(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def enqueue(self, session_id):
+        if self.waiting >= self.max_queue:
+            # Shed load up front rather than let every queued user's wait grow without bound
+            metrics.inc("sdlc_admission_total", kind="expensive", outcome="shed")
+            raise AdmissionRejected("The server is at capacity. Please try again in a minute.")
+        ticket = {"session": session_id, "event": asyncio.Event(), "enqueued": time.monotonic(), "granted": None}
+        self._queues.setdefault(session_id, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    def try_admit(self, session_id):
+        # For optional work such as speculation: a slot right now if one is spare and nobody is
+        # waiting, else None. It never queues, so it cannot delay a user's request
+        if self._queues or self._running >= self.max_concurrency:
+            metrics.inc("sdlc_admission_total", kind="optional", outcome="shed")
+            return None
+        now = time.monotonic()
+        ticket = {"session": session_id, "event": asyncio.Event(), "enqueued": now, "granted": now}
+        ticket["event"].set()
+        self._running += 1
+        metrics.inc("sdlc_admission_total", kind="optional", outcome="admitted")
+        return ticket
+
+    def _dispatch(self):
+        while self._running < self.max_concurrency and self._queues:
+            session_id, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            # Once served, the session moves to the back of the rotation
+            del self._queues[session_id]
+            if queue:
+                self._queues[session_id] = queue
+            ticket["granted"] = time.monotonic()
+            self._running += 1
+            metrics.inc("sdlc_admission_total", kind="expensive", outcome="admitted")
+            metrics.observe("sdlc_admission_wait_seconds", ticket["granted"] - ticket["enqueued"])
+            ticket["event"].set()
+
+    def position(self, ticket):
+        # 1-based place in the round-robin order in which waiters will be admitted
+        queues = list(self._queues.values())
+        order = 0
+        for depth in range(max((len(queue) for queue in queues), default=0)):
+            for queue in queues:
+                if depth < len(queue):
+                    order += 1
+                    if queue[depth] is ticket:
+                        return order
+        return 0
+
+    def eta_seconds(self, position):
+        return math.ceil(position / self.max_concurrency) * self._service_seconds
+
+    async def wait(self, ticket, interval=1.0):
+        # Yields (position, eta_seconds) whenever it changes, until the ticket is admitted
+        last = None
+        while not ticket["event"].is_set():
+            position = self.position(ticket)
+            status = (position, self.eta_seconds(position))
+            if status != last:
+                last = status
+                yield status
+            try:
+                await asyncio.wait_for(ticket["event"].wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, ticket):
+        if ticket["granted"] is not None:
+            self._running -= 1
+            # Moving average of how long an admitted request holds its slot, for the ETA
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - ticket["granted"])
+        else:
+            queue = self._queues.get(ticket["session"])
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket["session"]]
+            metrics.inc("sdlc_admission_total", kind="expensive", outcome="abandoned")
+        self._dispatch()
+
+    @contextmanager
+    def cheap(self):
+        if not self._cheap.acquire(timeout=self.cheap_timeout_seconds):
+            metrics.inc("sdlc_admission_total", kind="cheap", outcome="shed")
+            raise AdmissionRejected("The server is busy. Please try again.")
+        metrics.inc("sdlc_admission_total", kind="cheap", outcome="admitted")
+        try:
+            yield
+        finally:
+            self._cheap.release()
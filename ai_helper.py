@@ -1,67 +1,526 @@
-import openai
+import asyncio
 import json
 import re
-from config import OPENAI_API_KEY, PROMPTS, SYSTEM_MESSAGES, OPENAI_MODEL
+import time
+from config import (
+    OPENAI_API_KEY, OPENAI_API_BASE, PROMPTS, SYSTEM_MESSAGES, MODEL_PROFILES,
+    ROUTER_WINDOW_SECONDS, ROUTER_MIN_SAMPLES, ROUTER_MAX_ERROR_RATE, ROUTER_PROBE_INTERVAL_SECONDS,
+    OPENAI_MAX_CONCURRENCY, OPENAI_POOL_SIZE, OPENAI_MAX_CONTINUATIONS, STAGE_TOKEN_BUDGET, STAGE_TOKEN_BUDGETS,
+    CODEGEN_FANOUT, CODEGEN_MAX_PARALLEL_FILES, CODEGEN_FILE_RETRIES,
+    REQUIREMENTS_DIRECT_TOKENS, REQUIREMENTS_CHUNK_TOKENS, REQUIREMENTS_SUMMARY_TOKENS,
+    REQUIREMENTS_SUMMARY_WORKERS, REQUIREMENTS_CONTEXT_PASSAGES, STAGE_GRAPH, STAGE_GRAPH_ENABLED, STAGE_GRAPH_MEMO_SIZE,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS,
+    TRAFFIC_MODE, TRAFFIC_LOG_PATH, TRAFFIC_REPLAY_LATENCY_SCALE, TRAFFIC_REPLAY_MATCH
+)
+from code_parser import IncrementalCodeParser, parse_code_files
+from continuation import ContinuationStitcher, strip_overlap
+from llm_cache import ResponseCache, make_cache_key
+from model_router import ModelRouter
+from metrics import estimate_tokens, metrics, record_cache_lookup, record_llm_call
+from requirements_chunker import chunk_requirements
+from request_scheduler import INTERACTIVE, default_scheduler
+from singleflight import AsyncSingleFlight
+from stage_graph import StageFailed, StageGraph
+from traffic import create_traffic
+from requirements_index import format_requirements_context
 
-class AIHelper:
-    def __init__(self):
-        openai.api_key = OPENAI_API_KEY
 
-    def generate_response(self, prompt, system_message, temperature=0.7):
-        try:
-            response = openai.ChatCompletion.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
+def load_openai():
+    # openai 0.28 imports requests, aiohttp and, when installed, numpy and pandas; it is loaded
+    # on first use so importing the pipeline (and the UI) stays cheap
+    import openai
+    openai.api_key = OPENAI_API_KEY
+    if OPENAI_API_BASE:
+        openai.api_base = OPENAI_API_BASE
+    return openai
+
+
+def is_error_response(text):
+    return text.startswith("Error generating response:")
+
+
+def strip_code_fence(text):
+    # Remove a single markdown fence wrapped around the whole response
+    match = re.match(r'^\s*```[\w+-]*\n(.*?)\n?```\s*$', text, re.DOTALL)
+    return match.group(1) if match else text.strip()
+
+class CodeGenerationFailed(Exception):
+    pass
 
-    def generate_hld(self, requirements):
+
+class AIHelper:
+    def __init__(self, cache=None, scheduler=None, priority=INTERACTIVE, traffic=None):
+        if cache is None and LLM_CACHE_ENABLED:
+            cache = ResponseCache(LLM_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS)
+        self.cache = cache
+        # Batch callers pass priority=BATCH so interactive users are served first
+        self.scheduler = scheduler or default_scheduler
+        self.priority = priority
+        self.max_concurrency = OPENAI_MAX_CONCURRENCY
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+        self.async_flights = AsyncSingleFlight()
+        # Records API exchanges to, or replays them from, a traffic log (TRAFFIC_MODE)
+        self.traffic = traffic or create_traffic(
+            TRAFFIC_MODE, TRAFFIC_LOG_PATH, load_openai, TRAFFIC_REPLAY_LATENCY_SCALE, TRAFFIC_REPLAY_MATCH
+        )
+        self.router = ModelRouter(
+            ROUTER_WINDOW_SECONDS, ROUTER_MIN_SAMPLES, ROUTER_MAX_ERROR_RATE, ROUTER_PROBE_INTERVAL_SECONDS
+        )
+        self.stages = StageGraph(
+            STAGE_GRAPH, self._arun_stage, STAGE_GRAPH_MEMO_SIZE, self._astream_stage, self._stage_route
+        )
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else {}
+
+    def _client(self, stage):
+        # The openai module, or the traffic log standing in for it
+        return self.traffic.client(stage) if self.traffic else load_openai()
+
+    def _profile(self, stage, temperature=None, max_tokens=None):
+        # Explicit arguments win over the stage's profile, which wins over the default profile
+        profile = {**MODEL_PROFILES["default"], **MODEL_PROFILES.get(stage, {})}
+        if temperature is not None:
+            profile["temperature"] = temperature
+        if max_tokens is not None:
+            profile["max_tokens"] = max_tokens
+        return profile
+
+    def _cache_key(self, prompt, system_message, profile):
+        return make_cache_key(profile["model"], system_message, prompt, profile["temperature"], profile["max_tokens"])
+
+    def _cached(self, key, use_cache, stage, profile):
+        if not use_cache:
+            return None
+        cached = self.cache.get(key)
+        record_cache_lookup(stage, cached is not None)
+        if cached is not None:
+            record_llm_call(profile["model"], stage, "cache_hit", 0.0)
+        return cached
+
+    def _request_kwargs(self, prompt, system_message, profile, model, max_tokens, partial=""):
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        if partial:
+            # Resume a reply that hit max_tokens from exactly where it stopped
+            messages += [
+                {"role": "assistant", "content": partial},
+                {"role": "user", "content": PROMPTS["continue_response"]}
+            ]
+        return dict(
+            model=model, messages=messages, temperature=profile["temperature"], max_tokens=max_tokens,
+            request_timeout=profile["timeout"]
+        )
+
+    def _continuation_tokens(self, stage, max_tokens, used):
+        # Completion tokens the next continuation may ask for; 0 once the stage budget is spent
+        return max(0, min(max_tokens, STAGE_TOKEN_BUDGETS.get(stage, STAGE_TOKEN_BUDGET) - used))
+
+    def _reserved_tokens(self, prompt, system_message, max_tokens):
+        return estimate_tokens(system_message) + estimate_tokens(prompt) + max_tokens
+
+    def _record_response(self, response, stage, model, start, reserved):
+        choice = response.choices[0]
+        usage = response.get("usage") or {}
+        duration = time.perf_counter() - start
+        self.scheduler.settle(reserved, usage.get("total_tokens", reserved))
+        self.router.record(stage, model, duration, True)
+        record_llm_call(
+            model, stage, "ok", duration,
+            usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), choice.get("finish_reason")
+        )
+        content = choice.message.content
+        return content, choice.get("finish_reason"), usage.get("completion_tokens", estimate_tokens(content))
+
+    def _prompt_tokens(self, prompt, system_message):
+        # Streamed responses carry no usage block, so token counts are estimated
+        return estimate_tokens(system_message) + estimate_tokens(prompt)
+
+    def _record_stream(self, prompt, system_message, parts, finish_reason, stage, model, start):
+        prompt_tokens = self._prompt_tokens(prompt, system_message)
+        duration = time.perf_counter() - start
+        self.router.record(stage, model, duration, True)
+        record_llm_call(model, stage, "ok", duration, prompt_tokens, len(parts), finish_reason)
+
+    def _record_error(self, error, stage, model, start):
+        duration = time.perf_counter() - start
+        self.router.record(stage, model, duration, False)
+        record_llm_call(model, stage, "error", duration, error=str(error))
+        return f"Error generating response: {str(error)}"
+
+    def _async_resources(self):
+        # The pooled session and the semaphore are bound to the running event loop
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=OPENAI_POOL_SIZE, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        if not (self.traffic and self.traffic.offline):
+            load_openai().aiosession.set(self._session)
+        return self._semaphore
+
+    async def aclose(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def agenerate_response(self, prompt, system_message, temperature=None,
+                                 max_tokens=None, use_cache=True, stage="llm"):
+        use_cache = use_cache and self.cache is not None
+        profile = self._profile(stage, temperature, max_tokens)
+        key = self._cache_key(prompt, system_message, profile)
+        cached = self._cached(key, use_cache, stage, profile)
+        if cached is not None:
+            return cached
+        content, shared = await self.async_flights.run(
+            key, lambda: self._agenerate_upstream(prompt, system_message, profile, use_cache, stage, key)
+        )
+        if shared:
+            metrics.inc("sdlc_llm_coalesced_total", stage=stage)
+        return content
+
+    async def _agenerate_upstream(self, prompt, system_message, profile, use_cache, stage, key):
+        return "".join([
+            chunk async for chunk in self._aupstream(prompt, system_message, profile, use_cache, stage, key, False)
+        ])
+
+    async def astream_response(self, prompt, system_message, temperature=None,
+                               max_tokens=None, use_cache=True, stage="llm"):
+        use_cache = use_cache and self.cache is not None
+        profile = self._profile(stage, temperature, max_tokens)
+        key = self._cache_key(prompt, system_message, profile)
+        cached = self._cached(key, use_cache, stage, profile)
+        if cached is not None:
+            yield cached
+            return
+        # Late subscribers to an identical in-flight stream replay it from the first token
+        shared, chunks = self.async_flights.stream(
+            key, lambda: self._astream_upstream(prompt, system_message, profile, use_cache, stage, key)
+        )
+        if shared:
+            metrics.inc("sdlc_llm_coalesced_total", stage=stage)
+        async for chunk in chunks:
+            yield chunk
+
+    def _astream_upstream(self, prompt, system_message, profile, use_cache, stage, key):
+        return self._aupstream(prompt, system_message, profile, use_cache, stage, key, True)
+
+    async def _aupstream(self, prompt, system_message, profile, use_cache, stage, key, stream):
+        # The continuation loop behind both entry points: yields text as it is generated, a whole
+        # reply per call unless streaming, and resumes replies cut off at max_tokens until the
+        # stage's token budget is spent
+        openai = self._client(stage)
+        model = self.router.choose(stage, profile)
+        max_tokens = profile["max_tokens"]
+        content = ""
+        used = 0
+        call_tokens = max_tokens
+        for continuation in range(OPENAI_MAX_CONTINUATIONS + 1):
+            request = self._request_kwargs(prompt, system_message, profile, model, call_tokens, content)
+            reserved = self._reserved_tokens(prompt + content, system_message, call_tokens)
+            start = time.perf_counter()
+            parts = []
+            finish_reason = None
+            stitcher = ContinuationStitcher(content)
+            try:
+                async with self._async_resources():
+                    # Retries cover opening the stream; once tokens flow a failure is reported as is
+                    response = await self.scheduler.acall(
+                        lambda: openai.ChatCompletion.acreate(stream=stream, **request), reserved, self.priority
+                    )
+                    if not stream:
+                        text, finish_reason, completion_tokens = self._record_response(
+                            response, stage, model, start, reserved
+                        )
+                        parts.append(text)
+                    else:
+                        try:
+                            async for chunk in response:
+                                choice = chunk.choices[0]
+                                finish_reason = choice.get("finish_reason") or finish_reason
+                                delta = choice.delta.get("content")
+                                if delta:
+                                    if not parts and not continuation:
+                                        metrics.observe("sdlc_llm_time_to_first_token_seconds", time.perf_counter() - start, stage=stage)
+                                    parts.append(delta)
+                                    delta = stitcher.feed(delta)
+                                    if delta:
+                                        content += delta
+                                        yield delta
+                        finally:
+                            # However the stream ends (done, broken or cancelled), only what arrived is charged
+                            self.scheduler.settle(reserved, self._prompt_tokens(prompt, system_message) + len(parts))
+                        completion_tokens = len(parts)
+            except Exception as e:
+                error = self._record_error(e, stage, model, start)
+                # A failed continuation keeps what was generated, but it is not cached
+                if not continuation:
+                    yield error
+                return
+            # A whole reply is stitched at once; a stream releases the start it held back
+            tail = stitcher.finish() if stream else strip_overlap(content, parts[0])
+            if tail:
+                content += tail
+                yield tail
+            if stream:
+                self._record_stream(prompt, system_message, parts, finish_reason, stage, model, start)
+            used += completion_tokens
+            call_tokens = self._continuation_tokens(stage, max_tokens, used)
+            if finish_reason != "length" or not call_tokens or continuation == OPENAI_MAX_CONTINUATIONS:
+                break
+            metrics.inc("sdlc_llm_continuations_total", stage=stage)
+        # Only completed replies are cached; a cancelled generator never reaches this point. Nor are
+        # fallback answers, so the primary's replaces them once it recovers
+        if use_cache and model == profile["model"]:
+            self.cache.set(key, content)
+
+    def _stage_request(self, name, node, values, use_cache):
+        return dict(
+            prompt=PROMPTS[node["prompt"]].format(**node.get("params", {}), **values),
+            system_message=SYSTEM_MESSAGES[node["system"]], max_tokens=node.get("max_tokens"),
+            use_cache=use_cache, stage=node.get("stage", name)
+        )
+
+    def _stage_route(self, name, node):
+        # Outputs memoized while a stage is on its fallback model are keyed apart, so once the
+        # primary recovers they are never served again, as with the response cache
+        stage = node.get("stage", name)
+        return self.router.route(stage, self._profile(stage))
+
+    async def _arun_stage(self, name, node, values, use_cache):
+        content = await self.agenerate_response(**self._stage_request(name, node, values, use_cache))
+        if is_error_response(content):
+            raise StageFailed(content)
+        return content
+
+    async def _astream_stage(self, name, node, values, use_cache):
+        async for chunk in self.astream_response(**self._stage_request(name, node, values, use_cache)):
+            if is_error_response(chunk):
+                raise StageFailed(chunk)
+            yield chunk
+
+    def _technical_inputs(self, hld, requirements_index):
+        return {"hld": hld, "requirements_context": self._requirements_context(requirements_index, hld)}
+
+    async def _astream_technical_design_graph(self, hld, use_cache, requirements_index):
+        try:
+            async for chunk in self.stages.astream(
+                "technical_design", self._technical_inputs(hld, requirements_index), use_cache
+            ):
+                yield chunk
+        except StageFailed as e:
+            yield str(e)
+
+    def _requirements_context(self, requirements_index, query):
+        if requirements_index is None:
+            return ""
+        return format_requirements_context(requirements_index.search(query, REQUIREMENTS_CONTEXT_PASSAGES))
+
+    def _summary_request(self, chunk):
+        prompt = PROMPTS["summarize_requirements_chunk"].format(chunk=chunk)
+        return dict(
+            prompt=prompt,
+            system_message=SYSTEM_MESSAGES["requirements"],
+            stage="requirements_summary"
+        )
+
+    def _merge_summaries(self, chunks, summaries):
+        merged = []
+        for chunk, summary in zip(chunks, summaries):
+            # A failed summary falls back to the head of its chunk rather than losing the section
+            if is_error_response(summary):
+                summary = chunk[:REQUIREMENTS_SUMMARY_TOKENS * 4]
+            merged.append(summary.strip())
+        return "\n\n".join(merged)
+
+    async def acondense_requirements(self, requirements, use_cache=True, depth=0):
+        if estimate_tokens(requirements) <= REQUIREMENTS_DIRECT_TOKENS or depth >= 3:
+            return requirements
+        chunks = chunk_requirements(requirements, REQUIREMENTS_CHUNK_TOKENS)
+        semaphore = asyncio.Semaphore(REQUIREMENTS_SUMMARY_WORKERS)
+
+        async def summarize(chunk):
+            async with semaphore:
+                return await self.agenerate_response(use_cache=use_cache, **self._summary_request(chunk))
+
+        summaries = await asyncio.gather(*(summarize(chunk) for chunk in chunks))
+        return await self.acondense_requirements(self._merge_summaries(chunks, summaries), use_cache, depth + 1)
+
+    async def agenerate_hld(self, requirements, use_cache=True):
+        requirements = await self.acondense_requirements(requirements, use_cache)
         prompt = PROMPTS["requirements_to_hld"].format(requirements=requirements)
-        return self.generate_response(prompt, SYSTEM_MESSAGES["hld"])
+        return await self.agenerate_response(prompt, SYSTEM_MESSAGES["hld"], use_cache=use_cache, stage="hld")
 
-    def generate_technical_design(self, hld):
-        prompt = PROMPTS["hld_to_technical"].format(hld=hld)
-        return self.generate_response(prompt, SYSTEM_MESSAGES["technical"])
+    async def astream_hld(self, requirements, use_cache=True):
+        requirements = await self.acondense_requirements(requirements, use_cache)
+        prompt = PROMPTS["requirements_to_hld"].format(requirements=requirements)
+        async for chunk in self.astream_response(prompt, SYSTEM_MESSAGES["hld"], use_cache=use_cache, stage="hld"):
+            yield chunk
+
+    async def agenerate_technical_design(self, hld, use_cache=True, requirements_index=None):
+        if STAGE_GRAPH_ENABLED:
+            try:
+                return await self.stages.run(
+                    "technical_design", self._technical_inputs(hld, requirements_index), use_cache
+                )
+            except StageFailed as e:
+                return str(e)
+        prompt = PROMPTS["hld_to_technical"].format(
+            hld=hld, requirements_context=self._requirements_context(requirements_index, hld)
+        )
+        return await self.agenerate_response(prompt, SYSTEM_MESSAGES["technical"], use_cache=use_cache, stage="technical_design")
+
+    def astream_technical_design(self, hld, use_cache=True, requirements_index=None):
+        if STAGE_GRAPH_ENABLED:
+            return self._astream_technical_design_graph(hld, use_cache, requirements_index)
+        prompt = PROMPTS["hld_to_technical"].format(
+            hld=hld, requirements_context=self._requirements_context(requirements_index, hld)
+        )
+        return self.astream_response(prompt, SYSTEM_MESSAGES["technical"], use_cache=use_cache, stage="technical_design")
+
+    async def agenerate_code_structure(self, technical_design, use_cache=True, fanout=None,
+                                       requirements_index=None, strict=False):
+        # strict raises CodeGenerationFailed where the UI would fall back to the template project
+        if CODEGEN_FANOUT if fanout is None else fanout:
+            return await self.agenerate_code_structure_fanout(
+                technical_design, use_cache, requirements_index, strict
+            )
+        prompt = PROMPTS["technical_to_code"].format(
+            technical_design=technical_design,
+            requirements_context=self._requirements_context(requirements_index, technical_design)
+        )
+        response = await self.agenerate_response(prompt, SYSTEM_MESSAGES["code"], use_cache=use_cache, stage="code")
+        return self.parse_code_structure(response, strict)
+
+    async def agenerate_code_structure_fanout(self, technical_design, use_cache=True, requirements_index=None,
+                                              strict=False):
+        # Phase 1: a short planning call returns the file manifest
+        prompt = PROMPTS["technical_to_manifest"].format(
+            technical_design=technical_design,
+            requirements_context=self._requirements_context(requirements_index, technical_design)
+        )
+        response = await self.agenerate_response(
+            prompt, SYSTEM_MESSAGES["code"], use_cache=use_cache, stage="code_manifest"
+        )
+        manifest = self.parse_file_manifest(response)
+        if not manifest:
+            return await self.agenerate_code_structure(
+                technical_design, use_cache, fanout=False, requirements_index=requirements_index, strict=strict
+            )
 
-    def generate_code_structure(self, technical_design):
-        prompt = PROMPTS["technical_to_code"].format(technical_design=technical_design)
-        response = self.generate_response(prompt, SYSTEM_MESSAGES["code"])
-        
+        # Phase 2: every file body is generated concurrently, each retried on its own
+        manifest_text = "\n".join(f"- {entry['path']}: {entry['purpose']}" for entry in manifest)
+        semaphore = asyncio.Semaphore(CODEGEN_MAX_PARALLEL_FILES)
+
+        async def generate_file(entry):
+            prompt = PROMPTS["manifest_to_file"].format(
+                path=entry["path"],
+                purpose=entry["purpose"],
+                technical_design=technical_design,
+                manifest=manifest_text,
+                requirements_context=self._requirements_context(
+                    requirements_index, f"{entry['path']} {entry['purpose']}"
+                )
+            )
+            async with semaphore:
+                for attempt in range(CODEGEN_FILE_RETRIES + 1):
+                    content = await self.agenerate_response(
+                        prompt, SYSTEM_MESSAGES["code"], use_cache=use_cache and attempt == 0, stage="code_file"
+                    )
+                    if not is_error_response(content):
+                        return entry["path"], strip_code_fence(content) + "\n"
+            print(f"Error generating {entry['path']}: {content}")
+            return entry["path"], None
+
+        results = await asyncio.gather(*(generate_file(entry) for entry in manifest))
+        code_structure = {path: content for path, content in results if content is not None}
+        failed = [path for path, content in results if content is None]
+        if strict and failed:
+            raise CodeGenerationFailed(f"Failed to generate {', '.join(failed)}")
+        if not code_structure:
+            return self.fallback_code_structure()
+        return json.dumps(code_structure)
+
+    async def arepair_files(self, code_structure, failures, use_cache=True):
+        # Regenerate only the files the compiler rejected, each with its own diagnostics
+        semaphore = asyncio.Semaphore(CODEGEN_MAX_PARALLEL_FILES)
+
+        async def repair(path, diagnostics):
+            # Only the project headers this file includes go along, to keep the call small
+            included = re.findall(r'#\s*include\s*"([^"]+)"', code_structure[path])
+            headers = "\n".join(
+                f"// {header}\n{content}" for header, content in code_structure.items()
+                if header != path and any(header == name or header.endswith("/" + name) for name in included)
+            )
+            prompt = PROMPTS["repair_file"].format(
+                path=path,
+                diagnostics=diagnostics,
+                content=code_structure[path],
+                headers=headers or "(none)"
+            )
+            async with semaphore:
+                content = await self.agenerate_response(
+                    prompt, SYSTEM_MESSAGES["code"], use_cache=use_cache, stage="code_repair"
+                )
+            if is_error_response(content):
+                print(f"Error repairing {path}: {content}")
+                return path, None
+            return path, strip_code_fence(content) + "\n"
+
+        results = await asyncio.gather(*(repair(path, diagnostics) for path, diagnostics in failures.items()))
+        return {path: content for path, content in results if content is not None}
+
+    def parse_file_manifest(self, response):
         try:
-            # Extract JSON content if wrapped in code blocks
-            json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', response, re.DOTALL)
-            if json_match:
-                response = json_match.group(1)
-            
-            # Clean up the response while preserving newlines in code
-            response = response.strip()
-            code_structure = json.loads(response)
-            
-            # Validate and ensure minimum required files
-            required_files = ["src/main.cpp", "include/project_name.h", "CMakeLists.txt"]
-            if not all(any(req in filepath for req in required_files) for filepath in code_structure.keys()):
-                raise ValueError("Missing required files")
-                
-            # Format code content
-            formatted_structure = {}
-            for filepath, content in code_structure.items():
-                # Preserve newlines in code but clean up any JSON artifacts
-                formatted_content = content.replace('\\n', '\n').replace('\\"', '"')
-                formatted_structure[filepath] = formatted_content
-                
-            return json.dumps(formatted_structure)
-        except (json.JSONDecodeError, ValueError) as e:
-            # Provide a comprehensive fallback structure
-            project_name = "embedded_project"
-            return json.dumps({
-                f"include/{project_name}.h": f'''// filepath: include/{project_name}.h
+            entries = json.loads(strip_code_fence(response))
+        except json.JSONDecodeError:
+            return []
+        manifest = []
+        seen = set()
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, str):
+                entry = {"path": entry}
+            if not isinstance(entry, dict) or not entry.get("path") or entry["path"] in seen:
+                continue
+            seen.add(entry["path"])
+            manifest.append({"path": entry["path"], "purpose": entry.get("purpose", "")})
+        return manifest
+
+    def parse_code_structure(self, response, strict=False):
+        # Keep every complete file, even from truncated or slightly malformed output
+        code_structure = parse_code_files(response)
+        if not code_structure:
+            if strict:
+                raise CodeGenerationFailed(
+                    response if is_error_response(response) else "No files could be parsed from the code response"
+                )
+            return self.fallback_code_structure()
+        return json.dumps(code_structure)
+
+    async def astream_code_structure(self, technical_design, use_cache=True, requirements_index=None):
+        # Yields the growing {path: content} dict each time another file completes
+        prompt = PROMPTS["technical_to_code"].format(
+            technical_design=technical_design,
+            requirements_context=self._requirements_context(requirements_index, technical_design)
+        )
+        parser = IncrementalCodeParser()
+        async for chunk in self.astream_response(prompt, SYSTEM_MESSAGES["code"], use_cache=use_cache, stage="code"):
+            if parser.feed(chunk):
+                yield parser.finish()
+        if not parser.files:
+            yield json.loads(self.fallback_code_structure())
+
+    def fallback_code_structure(self):
+        # Provide a comprehensive fallback structure
+        project_name = "embedded_project"
+        return json.dumps({
+            f"include/{project_name}.h": f'''// filepath: include/{project_name}.h
 #pragma once
 
 #include <cstdint>
@@ -95,7 +554,7 @@ private:
 
 }} // namespace embedded
 ''',
-                f"src/{project_name}.cpp": f'''// filepath: src/{project_name}.cpp
+            f"src/{project_name}.cpp": f'''// filepath: src/{project_name}.cpp
 #include "{project_name}.h"
 #include <iostream>
 #include <thread>
@@ -139,7 +598,7 @@ void Controller::shutdown() {{
 
 }} // namespace embedded
 ''',
-                "src/main.cpp": '''// filepath: src/main.cpp
+            "src/main.cpp": '''// filepath: src/main.cpp
 #include <iostream>
 #include <memory>
 #include "embedded_project.h"
@@ -186,7 +645,7 @@ int main() {
     return 0;
 }
 ''',
-                "CMakeLists.txt": '''cmake_minimum_required(VERSION 3.10)
+            "CMakeLists.txt": '''cmake_minimum_required(VERSION 3.10)
 project(embedded_project)
 
 set(CMAKE_CXX_STANDARD 17)
@@ -219,7 +678,7 @@ target_link_libraries(${PROJECT_NAME} PRIVATE Threads::Threads)
 install(TARGETS ${PROJECT_NAME} DESTINATION bin)
 install(FILES include/embedded_project.h DESTINATION include)
 ''',
-                "tests/test_main.cpp": '''// filepath: tests/test_main.cpp
+            "tests/test_main.cpp": '''// filepath: tests/test_main.cpp
 #include <cassert>
 #include <memory>
 #include "embedded_project.h"
@@ -247,7 +706,7 @@ int main() {
     return 0;
 }
 ''',
-                "README.md": f'''# Embedded Project
+            "README.md": f'''# Embedded Project
 
 An embedded system implementation featuring:
 - Hardware Abstraction Layer (HAL) interface
@@ -275,4 +734,4 @@ make
 - src/ - Source files
 - tests/ - Unit tests
 '''
-            })
+        })
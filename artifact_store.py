@@ -0,0 +1,120 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from metrics import metrics
+
+
+class ArtifactStore:
+    # Content-addressed files under root/<key[:2]>/<key>/<filename>; the per-key directory keeps
+    # a readable download name. Modification time is bumped on every hit and serves as the
+    # LRU clock, since access times are unreliable on relatime/noatime mounts
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, max_age_seconds=7 * 24 * 3600, grace_seconds=300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        # Files used this recently are never evicted, so a path just handed to the UI stays valid
+        self.grace_seconds = grace_seconds
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stopped = threading.Event()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key, filename):
+        return os.path.join(self.root, key[:2], key, filename)
+
+    def get(self, key, filename):
+        path = self.path_for(key, filename)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, data, filename, key=None):
+        # Defaults to addressing by the bytes; callers with a cheaper or more stable key
+        # (e.g. a hash of the inputs) can pass it instead
+        key = key or hashlib.sha256(data).hexdigest()
+        path = self.get(key, filename)
+        if path is not None:
+            return path
+        path = self.path_for(key, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def _entries(self):
+        entries = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _remove(self, path, size, reason):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        metrics.inc("sdlc_artifact_evictions_total", reason=reason)
+        metrics.inc("sdlc_artifact_evicted_bytes_total", size, reason=reason)
+        directory = os.path.dirname(path)
+        if directory != self.root and not os.listdir(directory):
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def sweep(self):
+        # Drop expired files, then the least recently used ones until the store fits its budget
+        with self._lock:
+            now = time.time()
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            kept = []
+            for mtime, size, path in entries:
+                if now - mtime < self.grace_seconds:
+                    kept.append((mtime, size, path))
+                elif path.endswith(".tmp") or (self.max_age_seconds and now - mtime > self.max_age_seconds):
+                    self._remove(path, size, "age")
+                    total -= size
+                else:
+                    kept.append((mtime, size, path))
+            for mtime, size, path in kept:
+                if not self.max_bytes or total <= self.max_bytes:
+                    break
+                if now - mtime < self.grace_seconds:
+                    continue
+                self._remove(path, size, "size")
+                total -= size
+            return total
+
+    def start_sweeper(self, interval_seconds=300):
+        if self._sweeper is not None:
+            return
+        self._sweeper = threading.Thread(
+            target=self._sweep_loop, args=(interval_seconds,), name="artifact-sweeper", daemon=True
+        )
+        self._sweeper.start()
+
+    def _sweep_loop(self, interval_seconds):
+        while not self._stopped.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping artifacts: {str(e)}")
+            self._stopped.wait(interval_seconds)
+
+    def stop_sweeper(self):
+        self._stopped.set()
+
+    def stats(self):
+        entries = self._entries()
+        return {"files": len(entries), "bytes": sum(size for _, size, _ in entries)}
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import traceback
+from datetime import datetime
+
+from ai_helper import AIHelper, is_error_response
+from artifact_store import ArtifactStore
+from code_archive import save_code_archive
+from compile_check import CompileChecker, verify_and_repair
+from config import (
+    ARTIFACT_STORE_DIR, ARTIFACT_STORE_MAX_BYTES, ARTIFACT_STORE_MAX_AGE_SECONDS, DIAGRAM_RENDER_WORKERS,
+    REQUIREMENTS_PASSAGE_TOKENS, COMPILE_CHECK_COMMAND, COMPILE_CHECK_FLAGS, COMPILE_CHECK_WORKERS,
+    COMPILE_CHECK_TIMEOUT_SECONDS, COMPILE_CHECK_CACHE_PATH, COMPILE_REPAIR_ROUNDS,
+    LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS
+)
+from diagrams import DiagramRenderer
+from llm_cache import ResponseCache
+from requirements_chunker import read_requirements_file
+from request_scheduler import BATCH
+from requirements_index import BM25Index
+
+INPUT_EXTENSIONS = (".txt", ".md", ".rst")
+
+
+def discover_inputs(source):
+    # A directory of requirement files, or a manifest: JSON list / one path per line
+    if os.path.isdir(source):
+        paths = sorted(
+            path for path in glob.glob(os.path.join(source, "**", "*"), recursive=True)
+            if path.lower().endswith(INPUT_EXTENSIONS) and os.path.isfile(path)
+        )
+        # Names come from the relative path so files with the same basename do not collide
+        return [{"path": path, "name": input_name(os.path.relpath(path, source))} for path in paths]
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r') as f:
+        text = f.read()
+    try:
+        entries = json.loads(text)
+    except json.JSONDecodeError:
+        entries = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    inputs = []
+    for entry in entries:
+        entry = {"path": entry} if isinstance(entry, str) else dict(entry)
+        if not os.path.isabs(entry["path"]):
+            entry["path"] = os.path.join(base, entry["path"])
+        inputs.append(entry)
+    return inputs
+
+
+def input_name(path):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', os.path.splitext(path)[0]).strip('_') or "input"
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def completed_report(report_path, input_sha256):
+    try:
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if report.get("status") == "ok" and report.get("input_sha256") == input_sha256:
+        return report
+    return None
+
+
+async def run_pipeline(ai_helper, renderer, requirements, output_dir, use_cache=True, fanout=None,
+                       compile_checker=None):
+    stage_durations = {}
+    requirements_index = BM25Index.from_text(requirements, REQUIREMENTS_PASSAGE_TOKENS)
+
+    start = time.perf_counter()
+    hld = await ai_helper.agenerate_hld(requirements, use_cache=use_cache)
+    stage_durations["hld"] = time.perf_counter() - start
+    if is_error_response(hld):
+        raise RuntimeError(hld)
+
+    start = time.perf_counter()
+    technical_design = await ai_helper.agenerate_technical_design(
+        hld, use_cache=use_cache, requirements_index=requirements_index
+    )
+    stage_durations["technical_design"] = time.perf_counter() - start
+    if is_error_response(technical_design):
+        raise RuntimeError(technical_design)
+
+    start = time.perf_counter()
+    code_structure = json.loads(await ai_helper.agenerate_code_structure(
+        technical_design, use_cache=use_cache, fanout=fanout, requirements_index=requirements_index,
+        strict=True
+    ))
+    stage_durations["code"] = time.perf_counter() - start
+
+    compile_report = None
+    if compile_checker is not None:
+        start = time.perf_counter()
+        code_structure, compile_report = await verify_and_repair(
+            code_structure, ai_helper, compile_checker, COMPILE_REPAIR_ROUNDS, use_cache
+        )
+        stage_durations["compile_check"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    diagram_dir = os.path.join(output_dir, "diagrams")
+    os.makedirs(diagram_dir, exist_ok=True)
+    diagrams = []
+    for stage, text in (("hld", hld), ("technical_design", technical_design)):
+        _, paths = await asyncio.to_thread(renderer.extract_and_render, text)
+        for index, path in enumerate(paths):
+            target = os.path.join(diagram_dir, f"{stage}_{index + 1}.svg")
+            shutil.copyfile(path, target)
+            diagrams.append(target)
+    stage_durations["diagram_render"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    zip_path = await asyncio.to_thread(save_code_archive, code_structure, output_dir)
+    stage_durations["zip_build"] = time.perf_counter() - start
+
+    with open(os.path.join(output_dir, "hld.md"), 'w') as f:
+        f.write(hld)
+    with open(os.path.join(output_dir, "technical_design.md"), 'w') as f:
+        f.write(technical_design)
+    return {
+        "zip": zip_path,
+        "diagrams": diagrams,
+        "files": sorted(code_structure),
+        "compile_check": compile_report,
+        "stage_durations_s": {stage: round(value, 3) for stage, value in stage_durations.items()}
+    }
+
+
+async def process_input(entry, args, ai_helper, renderer, semaphore, compile_checker=None):
+    name = entry.get("name") or input_name(os.path.basename(entry["path"]))
+    output_dir = os.path.join(args.output, name)
+    report_path = os.path.join(output_dir, "report.json")
+    try:
+        requirements = read_requirements_file(entry["path"])
+    except OSError as e:
+        return {"input": entry["path"], "name": name, "status": "error", "error": str(e)}
+    input_sha256 = hashlib.sha256(requirements.encode("utf-8")).hexdigest()
+
+    if not args.force:
+        report = completed_report(report_path, input_sha256)
+        if report is not None:
+            print(f"[skip] {name}: already completed")
+            return dict(report, status="skipped")
+
+    async with semaphore:
+        os.makedirs(output_dir, exist_ok=True)
+        report = {
+            "input": entry["path"],
+            "name": name,
+            "project_name": entry.get("project_name", name),
+            "input_sha256": input_sha256,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        start = time.perf_counter()
+        try:
+            result = await run_pipeline(
+                ai_helper, renderer, requirements, output_dir,
+                use_cache=not args.no_cache, fanout=True if args.fanout else None,
+                compile_checker=compile_checker
+            )
+            report.update(result, status="ok")
+            print(f"[ok] {name} in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            report.update(status="error", error=str(e), traceback=traceback.format_exc())
+            print(f"[error] {name}: {e}")
+        report["duration_s"] = round(time.perf_counter() - start, 3)
+        write_json_atomic(report_path, report)
+        return report
+
+
+async def run_batch(args):
+    inputs = discover_inputs(args.source)
+    os.makedirs(args.output, exist_ok=True)
+    ai_helper = AIHelper(priority=BATCH)
+    artifacts = ArtifactStore(ARTIFACT_STORE_DIR, ARTIFACT_STORE_MAX_BYTES, ARTIFACT_STORE_MAX_AGE_SECONDS)
+    renderer = DiagramRenderer(artifacts, DIAGRAM_RENDER_WORKERS)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    compile_checker = CompileChecker(
+        ResponseCache(COMPILE_CHECK_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS),
+        COMPILE_CHECK_COMMAND, COMPILE_CHECK_FLAGS, COMPILE_CHECK_WORKERS, COMPILE_CHECK_TIMEOUT_SECONDS
+    ) if args.compile_check else None
+    try:
+        reports = await asyncio.gather(
+            *(process_input(entry, args, ai_helper, renderer, semaphore, compile_checker) for entry in inputs)
+        )
+    finally:
+        await ai_helper.aclose()
+        await asyncio.to_thread(artifacts.sweep)
+    summary = {
+        "total": len(reports),
+        "ok": sum(report["status"] == "ok" for report in reports),
+        "skipped": sum(report["status"] == "skipped" for report in reports),
+        "failed": sum(report["status"] == "error" for report in reports),
+        "reports": [
+            {key: report.get(key) for key in ("name", "input", "status", "duration_s", "zip", "error")}
+            for report in reports
+        ]
+    }
+    write_json_atomic(os.path.join(args.output, "batch_report.json"), summary)
+    print(f"{summary['ok']} ok, {summary['skipped']} skipped, {summary['failed']} failed")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SDLC pipeline headlessly over many requirement files")
+    parser.add_argument("source", help="Directory of requirement files, or a manifest (JSON list or one path per line)")
+    parser.add_argument("-o", "--output", default="batch_output", help="Output directory")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="Inputs processed at the same time")
+    parser.add_argument("--fanout", action="store_true", help="Plan files first and generate them in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache")
+    parser.add_argument("--compile-check", action="store_true",
+                        help="Syntax-check generated C++ and regenerate files that fail")
+    parser.add_argument("--force", action="store_true", help="Re-run inputs that already completed")
+    args = parser.parse_args(argv)
+    summary = asyncio.run(run_batch(args))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
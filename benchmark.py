@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from types import SimpleNamespace
+
+STAGES = ["hld", "technical_design", "code"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def timed(func, samples):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def start_mock_server(args):
+    command = [
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_openai_server.py"),
+        "--port", str(args.port),
+        "--latency", str(args.latency),
+        "--token-rate", str(args.token_rate),
+        "--failure-rate", str(args.failure_rate),
+        "--payload", args.payload,
+        "--diagrams", str(args.diagrams),
+        "--files", str(args.files),
+        *(f"--model-latency={item}" for item in args.model_latency),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{args.port}/v1/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock OpenAI server did not start")
+
+
+async def drain(updates):
+    last = None
+    async for last in updates:
+        pass
+    return last
+
+
+async def run_pipeline(app, user_id, bypass_cache, timings):
+    request = SimpleNamespace(session_hash=f"bench-{user_id}-{uuid.uuid4().hex[:8]}")
+    requirements = (
+        f"Benchmark user {user_id}: sample a temperature sensor at 100 Hz, "
+        "filter the readings and drive a PWM fan controller over I2C."
+    )
+
+    start = time.perf_counter()
+    update = await drain(app.save_requirements("bench_project", requirements, bypass_cache, request=request))
+    timings["hld"].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    update = await drain(app.save_hld(update[1], bypass_cache, request=request))
+    timings["technical_design"].append(time.perf_counter() - start)
+    app.save_technical_design(update[1], request)
+
+    start = time.perf_counter()
+    update = await drain(app.generate_code(bypass_cache, False, request=request))
+    timings["code"].append(time.perf_counter() - start)
+    return update is not None and update[0] is not None
+
+
+async def run_level(app, concurrency, runs_per_user, bypass_cache):
+    timings = {stage: [] for stage in STAGES}
+
+    async def user(user_id):
+        ok = 0
+        for _ in range(runs_per_user):
+            ok += await run_pipeline(app, user_id, bypass_cache, timings)
+        return ok
+
+    start = time.perf_counter()
+    succeeded = sum(await asyncio.gather(*(user(i) for i in range(concurrency))))
+    elapsed = time.perf_counter() - start
+    await app.ai_helper.aclose()
+    return timings, succeeded, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SDLC pipeline against a local mock OpenAI server")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma separated concurrency levels")
+    parser.add_argument("--runs-per-user", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-rate", type=float, default=500.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--payload", choices=["valid", "truncated", "mixed"], default="valid")
+    parser.add_argument("--diagrams", type=int, default=4)
+    parser.add_argument("--files", type=int, default=6)
+    parser.add_argument("--fast-model", help="Set OPENAI_FAST_MODEL, the light-stage and fallback model")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="Extra mock latency for one model, e.g. mock-model=5 to trigger fallbacks")
+    parser.add_argument("--replay", metavar="TRAFFIC_LOG",
+                        help="Answer from a recorded traffic log instead of the mock server")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="With --replay: multiply recorded latencies, 0 to profile only the non-LLM work")
+    parser.add_argument("--use-cache", action="store_true", help="Let the response cache serve repeat prompts")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        server = None
+        os.environ["TRAFFIC_MODE"] = "replay"
+        os.environ["TRAFFIC_LOG_PATH"] = args.replay
+        os.environ["TRAFFIC_REPLAY_LATENCY_SCALE"] = str(args.latency_scale)
+    else:
+        server = start_mock_server(args)
+        os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ.setdefault("OPENAI_MODEL", "mock-model")
+    if args.fast_model:
+        os.environ["OPENAI_FAST_MODEL"] = args.fast_model
+    try:
+        # Imported late so config picks up the mock endpoint
+        import code_archive
+        import graphviz
+        from artifact_store import ArtifactStore
+        from sdlc_app import SDLCApp
+
+        app = SDLCApp()
+        graphviz_samples = []
+        zip_samples = []
+        # Time the rendering and zipping themselves; artifact store hits are not counted
+        graphviz.Source.pipe = timed(graphviz.Source.pipe, graphviz_samples)
+        code_archive.build_code_archive = timed(code_archive.build_code_archive, zip_samples)
+
+        report = []
+        for concurrency in [int(level) for level in args.concurrency.split(",") if level]:
+            del graphviz_samples[:], zip_samples[:]
+            # A fresh store per level, so no level is served diagrams and zips built by an earlier one
+            with tempfile.TemporaryDirectory(prefix="sdlc-bench-") as artifact_dir:
+                app.artifacts = app.diagram_renderer.store = ArtifactStore(artifact_dir)
+                timings, succeeded, elapsed = asyncio.run(
+                    run_level(app, concurrency, args.runs_per_user, not args.use_cache)
+                )
+            pipelines = concurrency * args.runs_per_user
+            level = {
+                "concurrency": concurrency,
+                "pipelines": pipelines,
+                "succeeded": succeeded,
+                "elapsed_s": elapsed,
+                "throughput_per_s": pipelines / elapsed if elapsed else 0.0,
+                "peak_rss_mb": peak_rss_mb(),
+                "graphviz_total_s": sum(graphviz_samples),
+                "graphviz_renders": len(graphviz_samples),
+                "routing": app.ai_helper.router.report(),
+                "zip_total_s": sum(zip_samples),
+                "zip_builds": len(zip_samples),
+                "stages": {
+                    stage: {f"p{pct}": percentile(values, pct) for pct in (50, 95, 99)}
+                    for stage, values in timings.items()
+                }
+            }
+            report.append(level)
+            print(f"\nconcurrency={concurrency} pipelines={pipelines} ok={succeeded} "
+                  f"elapsed={elapsed:.2f}s throughput={level['throughput_per_s']:.2f}/s "
+                  f"peak_rss={level['peak_rss_mb']:.1f}MB")
+            print(f"  graphviz: {level['graphviz_total_s']:.3f}s over {level['graphviz_renders']} renders, "
+                  f"zip: {level['zip_total_s']:.3f}s over {level['zip_builds']} builds")
+            for stage, stats in level["stages"].items():
+                print(f"  {stage:<17} p50={stats['p50']:.3f}s p95={stats['p95']:.3f}s p99={stats['p99']:.3f}s")
+            for stage, routing in level["routing"].items():
+                models = ", ".join(
+                    f"{model} {stats['calls']} calls p90={stats['p90_s']:.3f}s errors={stats['error_rate']:.0%}"
+                    for model, stats in routing["models"].items()
+                )
+                print(f"  route {stage:<20} -> {routing['route']} ({models})")
+
+        if args.json_path:
+            with open(args.json_path, 'w') as f:
+                json.dump(report, f, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
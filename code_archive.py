@@ -0,0 +1,55 @@
+import hashlib
+import io
+import json
+import os
+import uuid
+import zipfile
+from datetime import datetime
+from metrics import track_stage
+
+
+def safe_relative_path(path):
+    # Generated paths are untrusted: never let one escape the directory it is written or unzipped to.
+    # Backslashes count as separators, since Windows tools unzip them as such
+    normalized = os.path.normpath(path.replace("\\", "/").lstrip("/"))
+    if normalized == "." or normalized.startswith("..") or os.path.isabs(normalized):
+        return None
+    return normalized
+
+
+def build_code_archive(code_structure):
+    # Deflate at the highest level: generated sources are small, repetitive text
+    buffer = io.BytesIO()
+    date_time = datetime.now().timetuple()[:6]
+    with track_stage("zip_build", files=len(code_structure)), \
+            zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as zipf:
+        for filepath, content in code_structure.items():
+            name = safe_relative_path(filepath)
+            if name is None:
+                print(f"Skipping unsafe path in code archive: {filepath}")
+                continue
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            zipf.writestr(info, content.replace('\r\n', '\n'), compresslevel=9)
+    return buffer.getvalue()
+
+
+def unique_archive_name(prefix="generated_code"):
+    # The random suffix keeps two runs finishing in the same second apart
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.zip"
+
+
+def store_code_archive(code_structure, store):
+    # Keyed by the file contents, so regenerating identical code reuses the stored zip
+    key = hashlib.sha256(json.dumps(code_structure, sort_keys=True).encode("utf-8")).hexdigest()
+    return store.get(key, "generated_code.zip") or store.put(
+        build_code_archive(code_structure), "generated_code.zip", key
+    )
+
+
+def save_code_archive(code_structure, output_dir="."):
+    zip_filename = os.path.join(output_dir, unique_archive_name())
+    with open(zip_filename, 'wb') as f:
+        f.write(build_code_archive(code_structure))
+    return zip_filename
@@ -0,0 +1,151 @@
+import re
+
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+SEEK_OBJECT, SEEK_KEY, KEY, SEEK_COLON, SEEK_VALUE, VALUE, SKIP_VALUE, DONE = range(8)
+
+
+def unescape_double_encoded(content):
+    # Some models escape twice; only undo it when the file has no real line breaks at all
+    if '\n' not in content and '\\n' in content:
+        return content.replace('\\n', '\n').replace('\\t', '\t').replace('\\"', '"')
+    return content
+
+
+# Parses a streamed {"path": "content", ...} object and emits each file as soon as its
+# content string closes. Anything before the opening brace (prose, a ```json fence) is
+# ignored and malformed separators are skipped, so a truncated or slightly broken
+# response still yields every complete entry.
+class IncrementalCodeParser:
+    def __init__(self):
+        self.files = {}
+        self.pending_path = None
+        self._buffer = ""
+        self._state = SEEK_OBJECT
+        self._chars = []
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._closed = False
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        completed = []
+        pos = 0
+        buffer = self._buffer
+        while pos < len(buffer) and self._state != DONE:
+            char = buffer[pos]
+            if self._state == SEEK_OBJECT:
+                if char == '{':
+                    self._state = SEEK_KEY
+                pos += 1
+            elif self._state == SEEK_KEY:
+                if char == '"':
+                    self._chars = []
+                    self._state = KEY
+                elif char == '}':
+                    self._state = DONE
+                pos += 1
+            elif self._state in (KEY, VALUE):
+                pos = self._read_string(buffer, pos)
+                if not self._closed:
+                    break
+                if self._state == KEY:
+                    self._key = self._decoded()
+                    self._state = SEEK_COLON
+                else:
+                    content = unescape_double_encoded(self._decoded())
+                    self.files[self._key] = content
+                    completed.append((self._key, content))
+                    self.pending_path = None
+                    self._state = SEEK_KEY
+            elif self._state == SEEK_COLON:
+                if char == ':':
+                    self._state = SEEK_VALUE
+                elif not char.isspace():
+                    # A key without a colon is not an entry; treat the string as noise
+                    self._state = SEEK_KEY
+                    continue
+                pos += 1
+            elif self._state == SEEK_VALUE:
+                if char == '"':
+                    self._chars = []
+                    self.pending_path = self._key
+                    self._state = VALUE
+                elif not char.isspace():
+                    self._depth = 0
+                    self._in_string = False
+                    self._escaped = False
+                    self._state = SKIP_VALUE
+                    continue
+                pos += 1
+            elif self._state == SKIP_VALUE:
+                # Non-string values (nested objects, numbers) are not files; skip them whole
+                if self._in_string:
+                    if self._escaped:
+                        self._escaped = False
+                    elif char == '\\':
+                        self._escaped = True
+                    elif char == '"':
+                        self._in_string = False
+                elif char == '"':
+                    self._in_string = True
+                elif char in '{[':
+                    self._depth += 1
+                elif char in '}]':
+                    if self._depth == 0:
+                        self._state = DONE
+                    self._depth -= 1
+                elif char == ',' and self._depth == 0:
+                    self._state = SEEK_KEY
+                pos += 1
+        self._buffer = buffer[pos:]
+        return completed
+
+    def _decoded(self):
+        # Recombine surrogate pairs that arrived as separate \u escapes
+        text = ''.join(self._chars)
+        return text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+
+    def _read_string(self, buffer, pos):
+        # Decode JSON string characters until the closing quote, stopping early at an incomplete escape
+        self._closed = False
+        length = len(buffer)
+        while pos < length:
+            char = buffer[pos]
+            if char == '"':
+                self._closed = True
+                return pos + 1
+            if char != '\\':
+                end = pos
+                while end < length and buffer[end] not in '"\\':
+                    end += 1
+                self._chars.append(buffer[pos:end])
+                pos = end
+                continue
+            if pos + 1 >= length:
+                return pos
+            escape = buffer[pos + 1]
+            if escape == 'u':
+                if pos + 6 > length:
+                    return pos
+                hex_digits = buffer[pos + 2:pos + 6]
+                if re.fullmatch(r'[0-9a-fA-F]{4}', hex_digits):
+                    self._chars.append(chr(int(hex_digits, 16)))
+                else:
+                    self._chars.append(hex_digits)
+                pos += 6
+                continue
+            self._chars.append(ESCAPES.get(escape, escape))
+            pos += 2
+        return pos
+
+    def finish(self):
+        return dict(self.files)
+
+
+def parse_code_files(text):
+    parser = IncrementalCodeParser()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from code_archive import safe_relative_path
+from metrics import metrics, track_stage
+
+SOURCE_EXTENSIONS = (".cpp", ".cc", ".cxx", ".c++")
+HEADER_EXTENSIONS = (".h", ".hpp", ".hh", ".hxx")
+DIAGNOSTIC_PATTERN = re.compile(r'^(?:In file included from )?([^:\s][^:]*):\d+(?::\d+)?:?\s*(?:fatal )?error', re.MULTILINE)
+
+
+def limit_resources(command, cpu_seconds=60, memory_bytes=2 * 1024 ** 3):
+    # rlimits through prlimit(1) rather than preexec_fn, which is not safe to run from the
+    # checker's worker threads; without prlimit only the wall-clock timeout applies
+    prlimit = shutil.which("prlimit")
+    if prlimit is None:
+        return command
+    return [prlimit, f"--cpu={cpu_seconds}", f"--as={memory_bytes}", "--", *command]
+
+
+class CompileChecker:
+    # Syntax-checks every translation unit and header of a generated project in parallel.
+    # Results are cached by the unit's contents plus every header it could include
+    def __init__(self, cache=None, command="g++", flags="-std=c++17 -fsyntax-only", max_workers=4,
+                 timeout_seconds=60):
+        self.cache = cache
+        self.command = command
+        self.flags = shlex.split(flags)
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="compile-check")
+
+    @property
+    def available(self):
+        return shutil.which(self.command) is not None
+
+    def units(self, code_structure):
+        return sorted(
+            path for path in code_structure
+            if path.endswith(SOURCE_EXTENSIONS + HEADER_EXTENSIONS) and safe_relative_path(path)
+        )
+
+    def _cache_key(self, path, content, headers_digest):
+        payload = json.dumps([self.command, self.flags, path, content, headers_digest])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def check(self, code_structure):
+        # Returns {path: {"ok": bool, "diagnostics": str}} for every checked unit
+        headers_digest = hashlib.sha256(json.dumps(
+            sorted((path, content) for path, content in code_structure.items() if path.endswith(HEADER_EXTENSIONS))
+        ).encode("utf-8")).hexdigest()
+        results = {}
+        pending = []
+        for path in self.units(code_structure):
+            key = self._cache_key(path, code_structure[path], headers_digest)
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                results[path] = json.loads(cached)
+                metrics.inc("sdlc_compile_checks_total", result="cached")
+            else:
+                pending.append((path, key))
+        if not pending:
+            return results
+        root = tempfile.mkdtemp(prefix="sdlc_compile_")
+        try:
+            with track_stage("compile_check", units=len(pending)):
+                include_dirs = self._write_tree(code_structure, root)
+                outcomes = self._executor.map(lambda item: self._check_unit(root, item[0], include_dirs), pending)
+                for (path, key), result in zip(pending, outcomes):
+                    results[path] = result
+                    if result.get("interrupted"):
+                        # Says nothing about the code, only about load at the time: check it again next run
+                        metrics.inc("sdlc_compile_checks_total", result="interrupted")
+                        continue
+                    metrics.inc("sdlc_compile_checks_total", result="ok" if result["ok"] else "failed")
+                    if self.cache:
+                        self.cache.set(key, json.dumps(result))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        return results
+
+    def _write_tree(self, code_structure, root):
+        include_dirs = {root}
+        for path, content in code_structure.items():
+            relative = safe_relative_path(path)
+            if relative is None:
+                continue
+            target = os.path.join(root, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'w') as f:
+                f.write(content)
+            if path.endswith(HEADER_EXTENSIONS):
+                # Models write both #include "foo.h" and #include "project/foo.h"; offer both roots
+                directory = os.path.dirname(target)
+                include_dirs.update((directory, os.path.dirname(directory)))
+        return sorted(include_dirs)
+
+    def _check_unit(self, root, path, include_dirs):
+        relative = safe_relative_path(path)
+        command = [self.command, *self.flags, *(f"-I{directory}" for directory in include_dirs)]
+        if path.endswith(HEADER_EXTENSIONS):
+            command += ["-x", "c++-header"]
+        command.append(relative)
+        try:
+            completed = subprocess.run(
+                limit_resources(command), cwd=root, capture_output=True, text=True,
+                timeout=self.timeout_seconds, stdin=subprocess.DEVNULL
+            )
+        except subprocess.TimeoutExpired:
+            return {"ok": False, "diagnostics": f"{relative}: error: compile check timed out", "interrupted": True}
+        diagnostics = completed.stderr.replace(root + os.sep, "")
+        # The driver killed outright, or reporting that the compiler proper was (e.g. by the CPU limit)
+        if completed.returncode < 0 or "signal terminated program" in diagnostics:
+            return {"ok": False, "diagnostics": diagnostics or f"{relative}: error: compile check was killed",
+                    "interrupted": True}
+        return {"ok": completed.returncode == 0, "diagnostics": diagnostics}
+
+    def failing_files(self, code_structure, results):
+        # Blame the file each error is reported in, so a broken header is repaired once rather
+        # than every source file that includes it
+        failures = {}
+        for path, result in results.items():
+            if result["ok"]:
+                continue
+            blamed = {
+                name for name in DIAGNOSTIC_PATTERN.findall(result["diagnostics"])
+                if name in code_structure
+            } or {path}
+            for name in blamed:
+                failures.setdefault(name, [])
+                if result["diagnostics"] not in failures[name]:
+                    failures[name].append(result["diagnostics"])
+        return {path: "\n".join(diagnostics)[-4000:] for path, diagnostics in failures.items()}
+
+
+async def verify_and_repair(code_structure, ai_helper, checker, rounds=2, use_cache=True):
+    # Returns (code_structure, report); the report lists what still fails after the last round
+    code_structure = dict(code_structure)
+    report = {"checked": 0, "repaired": [], "failing": {}, "available": checker.available}
+    if not report["available"]:
+        return code_structure, report
+    for round_index in range(rounds + 1):
+        results = await asyncio.to_thread(checker.check, code_structure)
+        report["checked"] = len(results)
+        failures = checker.failing_files(code_structure, results)
+        report["failing"] = failures
+        if not failures or round_index == rounds:
+            break
+        repaired = await ai_helper.arepair_files(code_structure, failures, use_cache=use_cache)
+        if not repaired:
+            break
+        code_structure.update(repaired)
+        report["repaired"].extend(path for path in repaired if path not in report["repaired"])
+    return code_structure, report
+
+
+def format_compile_report(report):
+    if not report["available"]:
+        return "Compile check skipped: compiler not found"
+    lines = [f"Checked {report['checked']} files"]
+    if report["repaired"]:
+        lines.append("Regenerated: " + ", ".join(report["repaired"]))
+    if report["failing"]:
+        lines.append("Still failing:")
+        lines.extend(f"--- {path}\n{diagnostics}" for path, diagnostics in report["failing"].items())
+    else:
+        lines.append("All files pass the syntax check")
+    return "\n".join(lines)
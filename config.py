@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 
@@ -5,6 +6,139 @@ load_dotenv()
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL')
+# Cheaper, faster model for light stages and as the fallback when OPENAI_MODEL is slow or failing
+OPENAI_FAST_MODEL = os.getenv('OPENAI_FAST_MODEL') or OPENAI_MODEL
+# Limit on a whole response, streamed or not: openai 0.28 makes it the aiohttp total timeout, so it
+# must cover reading the full stream, not just the first token
+OPENAI_TIMEOUT_SECONDS = float(os.getenv('OPENAI_TIMEOUT_SECONDS', '600'))
+OPENAI_API_BASE = os.getenv('OPENAI_API_BASE')
+OPENAI_MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', '2000'))
+OPENAI_MAX_CONCURRENCY = int(os.getenv('OPENAI_MAX_CONCURRENCY', '32'))
+OPENAI_POOL_SIZE = int(os.getenv('OPENAI_POOL_SIZE', '64'))
+# Replies cut off at max_tokens are resumed up to this many times, within a per-stage budget
+# of completion tokens; override single stages with a JSON object in STAGE_TOKEN_BUDGETS_JSON
+OPENAI_MAX_CONTINUATIONS = int(os.getenv('OPENAI_MAX_CONTINUATIONS', '3'))
+STAGE_TOKEN_BUDGET = int(os.getenv('STAGE_TOKEN_BUDGET', '8000'))
+STAGE_TOKEN_BUDGETS = {"code": 16000}
+STAGE_TOKEN_BUDGETS.update(json.loads(os.getenv('STAGE_TOKEN_BUDGETS_JSON', '{}')))
+# Provider limits shared by every caller in the process, plus retry policy for 429/5xx
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '500'))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '150000'))
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '5'))
+OPENAI_BACKOFF_BASE_SECONDS = float(os.getenv('OPENAI_BACKOFF_BASE_SECONDS', '1.0'))
+OPENAI_BACKOFF_MAX_SECONDS = float(os.getenv('OPENAI_BACKOFF_MAX_SECONDS', '60'))
+
+SESSION_STORE_BACKEND = os.getenv('SESSION_STORE_BACKEND', 'memory')
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', '.cache/sessions.sqlite3')
+SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', str(24 * 3600)))
+
+PROJECT_STORE_PATH = os.getenv('PROJECT_STORE_PATH', '.cache/projects.sqlite3')
+# Oldest versions of a project are pruned beyond this; 0 keeps every version
+PROJECT_STORE_MAX_VERSIONS = int(os.getenv('PROJECT_STORE_MAX_VERSIONS', '50'))
+
+# Rendered diagrams and code archives; swept by size and age in the background
+ARTIFACT_STORE_DIR = os.getenv('ARTIFACT_STORE_DIR', '.cache/artifacts')
+ARTIFACT_STORE_MAX_BYTES = int(os.getenv('ARTIFACT_STORE_MAX_BYTES', str(1024 * 1024 * 1024)))
+ARTIFACT_STORE_MAX_AGE_SECONDS = int(os.getenv('ARTIFACT_STORE_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+ARTIFACT_SWEEP_INTERVAL_SECONDS = int(os.getenv('ARTIFACT_SWEEP_INTERVAL_SECONDS', '300'))
+# Gradio copies every file it serves into its temp dir and never deletes the copies; inside the
+# artifact store they are swept along with the originals
+GRADIO_TEMP_DIR = os.getenv('GRADIO_TEMP_DIR', os.path.join(ARTIFACT_STORE_DIR, 'gradio'))
+DIAGRAM_RENDER_WORKERS = int(os.getenv('DIAGRAM_RENDER_WORKERS', str(os.cpu_count() or 4)))
+
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '.cache/llm_responses.sqlite3')
+LLM_CACHE_MAX_BYTES = int(os.getenv('LLM_CACHE_MAX_BYTES', str(100 * 1024 * 1024)))
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '7860'))
+
+METRICS_JSON_LOGS = os.getenv('METRICS_JSON_LOGS', 'false').lower() == 'true'
+# USD per 1K tokens; override with a JSON object in MODEL_PRICING_JSON
+MODEL_PRICING = {
+    "gpt-4o": {"prompt": 0.0025, "completion": 0.01},
+    "gpt-4o-mini": {"prompt": 0.00015, "completion": 0.0006},
+    "gpt-4-turbo": {"prompt": 0.01, "completion": 0.03},
+    "gpt-4": {"prompt": 0.03, "completion": 0.06},
+    "gpt-3.5-turbo": {"prompt": 0.0005, "completion": 0.0015},
+}
+MODEL_PRICING.update(json.loads(os.getenv('MODEL_PRICING_JSON', '{}')))
+
+CODEGEN_FANOUT = os.getenv('CODEGEN_FANOUT', 'false').lower() == 'true'
+CODEGEN_MAX_PARALLEL_FILES = int(os.getenv('CODEGEN_MAX_PARALLEL_FILES', '8'))
+CODEGEN_FILE_RETRIES = int(os.getenv('CODEGEN_FILE_RETRIES', '2'))
+
+# Optional g++ syntax check of generated code; failing files are sent back to the model
+COMPILE_CHECK_ENABLED = os.getenv('COMPILE_CHECK_ENABLED', 'false').lower() == 'true'
+COMPILE_CHECK_COMMAND = os.getenv('COMPILE_CHECK_COMMAND', 'g++')
+COMPILE_CHECK_FLAGS = os.getenv('COMPILE_CHECK_FLAGS', '-std=c++17 -fsyntax-only')
+COMPILE_CHECK_WORKERS = int(os.getenv('COMPILE_CHECK_WORKERS', str(os.cpu_count() or 4)))
+COMPILE_CHECK_TIMEOUT_SECONDS = int(os.getenv('COMPILE_CHECK_TIMEOUT_SECONDS', '60'))
+COMPILE_CHECK_CACHE_PATH = os.getenv('COMPILE_CHECK_CACHE_PATH', '.cache/compile_results.sqlite3')
+COMPILE_REPAIR_ROUNDS = int(os.getenv('COMPILE_REPAIR_ROUNDS', '2'))
+
+# Generate the technical design through STAGE_GRAPH (parallel sections and diagrams) instead of one call
+STAGE_GRAPH_ENABLED = os.getenv('STAGE_GRAPH_ENABLED', 'true').lower() == 'true'
+STAGE_GRAPH_MEMO_SIZE = int(os.getenv('STAGE_GRAPH_MEMO_SIZE', '512'))
+
+# TRAFFIC_MODE=record appends every OpenAI exchange (request key, response, timing, chunk timing,
+# usage) to TRAFFIC_LOG_PATH; TRAFFIC_MODE=replay answers from that log without the network, with the
+# recorded latencies times TRAFFIC_REPLAY_LATENCY_SCALE (0 replays instantly). TRAFFIC_REPLAY_MATCH=key
+# only serves exact request matches; "stage" falls back to the stage's recorded answers in turn
+TRAFFIC_MODE = os.getenv('TRAFFIC_MODE', 'off').lower()
+TRAFFIC_LOG_PATH = os.getenv('TRAFFIC_LOG_PATH', '.cache/traffic.jsonl')
+TRAFFIC_REPLAY_LATENCY_SCALE = float(os.getenv('TRAFFIC_REPLAY_LATENCY_SCALE', '1.0'))
+TRAFFIC_REPLAY_MATCH = os.getenv('TRAFFIC_REPLAY_MATCH', 'stage')
+
+# Admission control for UI handlers: LLM-bound handlers run at most ADMISSION_EXPENSIVE_CONCURRENCY
+# at a time, with up to ADMISSION_MAX_QUEUE waiting (round-robin across sessions) before new
+# requests are turned away; quick handlers have a separate limit
+ADMISSION_EXPENSIVE_CONCURRENCY = int(os.getenv('ADMISSION_EXPENSIVE_CONCURRENCY', '8'))
+ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '64'))
+ADMISSION_CHEAP_CONCURRENCY = int(os.getenv('ADMISSION_CHEAP_CONCURRENCY', '32'))
+ADMISSION_CHEAP_TIMEOUT_SECONDS = float(os.getenv('ADMISSION_CHEAP_TIMEOUT_SECONDS', '5'))
+
+# Start the next stage in the background as soon as the current one finishes (opt-in per user)
+SPECULATION_ENABLED = os.getenv('SPECULATION_ENABLED', 'false').lower() == 'true'
+# Speculative runs a session may throw away within SPECULATION_TTL_SECONDS before it pauses
+SPECULATION_SESSION_BUDGET = int(os.getenv('SPECULATION_SESSION_BUDGET', '3'))
+SPECULATION_TTL_SECONDS = int(os.getenv('SPECULATION_TTL_SECONDS', '900'))
+
+# Requirements longer than this are summarized chunk by chunk before the HLD call
+REQUIREMENTS_DIRECT_TOKENS = int(os.getenv('REQUIREMENTS_DIRECT_TOKENS', '6000'))
+REQUIREMENTS_CHUNK_TOKENS = int(os.getenv('REQUIREMENTS_CHUNK_TOKENS', '3000'))
+REQUIREMENTS_SUMMARY_TOKENS = int(os.getenv('REQUIREMENTS_SUMMARY_TOKENS', '600'))
+REQUIREMENTS_SUMMARY_WORKERS = int(os.getenv('REQUIREMENTS_SUMMARY_WORKERS', '8'))
+# Later stages get only the top-k BM25 matches from the original requirements
+REQUIREMENTS_PASSAGE_TOKENS = int(os.getenv('REQUIREMENTS_PASSAGE_TOKENS', '250'))
+REQUIREMENTS_CONTEXT_PASSAGES = int(os.getenv('REQUIREMENTS_CONTEXT_PASSAGES', '5'))
+
+# Model profile per stage (the stage label LLM calls are recorded under); a stage's entry overrides
+# only the keys it sets on top of "default". "fallback" takes the stage's calls while "model" has
+# a p90 latency over "latency_slo" seconds or mostly fails. The code stages keep no fallback so
+# the final output is never produced by the weaker model. Override with MODEL_PROFILES_JSON
+MODEL_PROFILES = {
+    "default": {
+        "model": OPENAI_MODEL, "fallback": OPENAI_FAST_MODEL, "temperature": 0.7,
+        "max_tokens": OPENAI_MAX_TOKENS, "timeout": OPENAI_TIMEOUT_SECONDS, "latency_slo": 60
+    },
+    "requirements_summary": {
+        "model": OPENAI_FAST_MODEL, "fallback": None, "temperature": 0.2,
+        "max_tokens": REQUIREMENTS_SUMMARY_TOKENS, "timeout": 120
+    },
+    "technical_diagram": {"model": OPENAI_FAST_MODEL, "fallback": None, "max_tokens": 1000, "timeout": 180},
+    "code_manifest": {"model": OPENAI_FAST_MODEL, "fallback": OPENAI_MODEL, "temperature": 0.2, "latency_slo": 30},
+    "code": {"fallback": None, "latency_slo": None},
+    "code_file": {"fallback": None, "latency_slo": None},
+    "code_repair": {"fallback": None, "temperature": 0.2, "latency_slo": None}
+}
+MODEL_PROFILES.update(json.loads(os.getenv('MODEL_PROFILES_JSON', '{}')))
+# Routing looks at each model's calls for a stage within this window
+ROUTER_WINDOW_SECONDS = int(os.getenv('ROUTER_WINDOW_SECONDS', '300'))
+ROUTER_MIN_SAMPLES = int(os.getenv('ROUTER_MIN_SAMPLES', '5'))
+ROUTER_MAX_ERROR_RATE = float(os.getenv('ROUTER_MAX_ERROR_RATE', '0.5'))
+ROUTER_PROBE_INTERVAL_SECONDS = int(os.getenv('ROUTER_PROBE_INTERVAL_SECONDS', '30'))
 
 PROMPTS = {
     "requirements_to_hld": """As a senior embedded systems architect, analyze these requirements and create a comprehensive high-level design for an embedded software system. 
@@ -44,7 +178,7 @@ Use ```dot notation for diagrams.
 
 High-Level Design:
 {hld}
-
+{requirements_context}
 Format your response with proper technical details, considerations, and relevant diagrams.""",
 
     "technical_to_code": '''As a senior embedded software developer, generate a complete C++ codebase structure based on this technical design.
@@ -52,7 +186,7 @@ Format your response as a valid JSON object containing file paths and their cont
 
 Technical Design:
 {technical_design}
-
+{requirements_context}
 Expected format example:
 {{
     "src/main.cpp": "#include <iostream>\\nint main() {{\\n    return 0;\\n}}\\n",
@@ -64,9 +198,136 @@ Expected format example:
 
 Note: Use proper C++ coding standards and include necessary header guards, error handling, and initialization.
 Generate complete, compilable code for an embedded system.
+''',
+
+    "summarize_requirements_chunk": """Condense this excerpt of an embedded systems requirements specification.
+Keep every requirement identifier, numeric constraint, timing budget, hardware interface, protocol and safety requirement.
+Drop boilerplate, repetition and narrative. Respond with a concise bullet list only.
+
+Excerpt:
+{chunk}""",
+
+    "technical_to_manifest": '''As a senior embedded software developer, plan the file layout of a complete C++ codebase for this technical design.
+Do not write any code yet. Respond with a valid JSON array only, one object per file, each with a "path" and a one-sentence "purpose".
+
+Technical Design:
+{technical_design}
+{requirements_context}
+Expected format example:
+[
+    {{"path": "include/project_name.h", "purpose": "Public interfaces and types"}},
+    {{"path": "src/project_name.cpp", "purpose": "Implementation of the public interfaces"}},
+    {{"path": "src/main.cpp", "purpose": "Application entry point"}},
+    {{"path": "CMakeLists.txt", "purpose": "Build configuration"}},
+    {{"path": "README.md", "purpose": "Build and usage instructions"}}
+]
+''',
+
+    "manifest_to_file": '''As a senior embedded software developer, write the complete contents of the file {path} for the codebase below.
+Purpose of this file: {purpose}
+
+Technical Design:
+{technical_design}
+{requirements_context}
+All files in the codebase (keep includes, names and build targets consistent with them):
+{manifest}
+
+Respond with the raw file contents only, without markdown fences or commentary.
+Use proper C++ coding standards and include necessary header guards, error handling, and initialization.
+''',
+
+    "technical_section": """As a technical lead for embedded systems, write the "{title}" section of the detailed technical specification for this high-level design.
+Cover {focus}.
+Write only this section, starting with the heading "## {title}". Do not include diagrams; they are produced separately.
+
+High-Level Design:
+{hld}
+{requirements_context}""",
+
+    "technical_diagram": """As a technical lead for embedded systems, draw the {title} diagram of the detailed technical specification for this high-level design.
+It should show {focus}.
+Respond with one Graphviz diagram in ```dot notation, preceded by a one-line caption starting with "### {title}", and nothing else.
+
+High-Level Design:
+{hld}""",
+
+    "continue_response": "Your previous reply was cut off. Continue exactly where it stopped, without repeating anything already written and without any commentary.",
+
+    "repair_file": '''As a senior embedded software developer, fix the compile errors in the file {path}.
+Change only what is needed to make it compile; keep its interfaces consistent with the rest of the codebase.
+
+Compiler diagnostics:
+{diagnostics}
+
+Current contents of {path}:
+{content}
+
+Headers it can include:
+{headers}
+
+Respond with the corrected raw file contents only, without markdown fences or commentary.
 '''
 }
 
+# Declarative stage graph. Every node lists its inputs: other nodes or values the caller supplies.
+# Nodes with a "prompt" are one LLM call (PROMPTS[prompt] formatted with the inputs and "params",
+# recorded and routed under "stage" if set, else the node name); nodes with a "merge" combine their
+# inputs locally. Independent nodes run concurrently and each is memoized by a hash of its inputs,
+# so after an edit only the nodes downstream of it run again.
+STAGE_GRAPH = {
+    # Technical design: four text sections and four diagrams, all depending only on the HLD
+    "technical_components": {
+        "inputs": ["hld", "requirements_context"], "prompt": "technical_section", "system": "technical",
+        "params": {"title": "Component Design",
+                   "focus": "every software component, its responsibilities, public interfaces and dependencies"}
+    },
+    "technical_data_flow": {
+        "inputs": ["hld", "requirements_context"], "prompt": "technical_section", "system": "technical",
+        "params": {"title": "Data Flow",
+                   "focus": "how data moves from acquisition through processing to outputs, with rates, buffering and timing budgets"}
+    },
+    "technical_hardware": {
+        "inputs": ["hld", "requirements_context"], "prompt": "technical_section", "system": "technical",
+        "params": {"title": "Hardware Interfaces",
+                   "focus": "each peripheral and bus, its driver, protocol, timing, interrupts and error handling"}
+    },
+    "technical_software": {
+        "inputs": ["hld", "requirements_context"], "prompt": "technical_section", "system": "technical",
+        "params": {"title": "Software Architecture",
+                   "focus": "the classes and modules, task or thread model, memory strategy, error handling and startup sequence"}
+    },
+    "technical_components_diagram": {
+        "inputs": ["hld"], "prompt": "technical_diagram", "system": "technical", "stage": "technical_diagram",
+        "params": {"title": "Component relationships",
+                   "focus": "the software components and which ones depend on or call each other"}
+    },
+    "technical_data_flow_diagram": {
+        "inputs": ["hld"], "prompt": "technical_diagram", "system": "technical", "stage": "technical_diagram",
+        "params": {"title": "Data flow",
+                   "focus": "the path data takes from sensors and inputs through processing to actuators and outputs"}
+    },
+    "technical_hardware_diagram": {
+        "inputs": ["hld"], "prompt": "technical_diagram", "system": "technical", "stage": "technical_diagram",
+        "params": {"title": "Hardware interfaces",
+                   "focus": "the microcontroller, its peripherals and buses, and the drivers that own them"}
+    },
+    "technical_software_diagram": {
+        "inputs": ["hld"], "prompt": "technical_diagram", "system": "technical", "stage": "technical_diagram",
+        "params": {"title": "Class diagram",
+                   "focus": "the main classes with their key members and inheritance or ownership relations"}
+    },
+    # Merged in document order: each section followed by its diagram
+    "technical_design": {
+        "inputs": [
+            "technical_components", "technical_components_diagram",
+            "technical_data_flow", "technical_data_flow_diagram",
+            "technical_hardware", "technical_hardware_diagram",
+            "technical_software", "technical_software_diagram"
+        ],
+        "merge": "concat"
+    }
+}
+
 SYSTEM_MESSAGES = {
     "requirements": "You are a senior business analyst helping to create clear and structured software requirements for embedded systems.",
     "hld": "You are a senior embedded systems architect creating high-level design documents.",
@@ -0,0 +1,34 @@
+def strip_overlap(existing, addition, min_overlap=10, window=2000):
+    # A resumed completion often repeats the tail of what it already wrote; drop the longest
+    # prefix of the addition that the existing text already ends with
+    longest = min(len(existing), len(addition), window)
+    for size in range(longest, min_overlap - 1, -1):
+        if existing.endswith(addition[:size]):
+            return addition[size:]
+    return addition
+
+
+class ContinuationStitcher:
+    # Streaming counterpart of strip_overlap: holds back the start of a continuation until
+    # enough of it has arrived to find the overlap, then passes deltas straight through
+    def __init__(self, existing, window=400):
+        self.existing = existing
+        self.window = window
+        self._pending = ""
+        self._resolved = False
+
+    def feed(self, delta):
+        if self._resolved:
+            return delta
+        self._pending += delta
+        if len(self._pending) < min(self.window, len(self.existing)):
+            return ""
+        return self.finish()
+
+    def finish(self):
+        if self._resolved:
+            return ""
+        self._resolved = True
+        addition = strip_overlap(self.existing, self._pending, window=self.window)
+        self._pending = ""
+        return addition
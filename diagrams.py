@@ -0,0 +1,42 @@
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from metrics import track_stage
+
+DOT_BLOCK_PATTERN = re.compile(r'```dot(.*?)```', re.DOTALL)
+
+
+def extract_dot_blocks(text):
+    return [match.strip() for match in DOT_BLOCK_PATTERN.findall(text) if match.strip()]
+
+
+def strip_dot_blocks(text):
+    return DOT_BLOCK_PATTERN.sub('', text).strip()
+
+
+class DiagramRenderer:
+    def __init__(self, store, max_workers=4):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graphviz")
+
+    def render(self, source):
+        # SVGs are content-addressed, so an unchanged diagram is never rendered twice
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        svg_path = self.store.get(digest, "diagram.svg")
+        if svg_path is not None:
+            return svg_path
+        import graphviz
+        try:
+            with track_stage("diagram_render"):
+                svg = graphviz.Source(source).pipe(format='svg')
+        except Exception as e:
+            print(f"Error rendering diagram: {str(e)}")
+            return None
+        return self.store.put(svg, "diagram.svg", digest)
+
+    def render_all(self, sources):
+        paths = self._executor.map(self.render, sources)
+        return [path for path in paths if path]
+
+    def extract_and_render(self, text):
+        return strip_dot_blocks(text), self.render_all(extract_dot_blocks(text))
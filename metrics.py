@@ -0,0 +1,166 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from config import METRICS_JSON_LOGS, MODEL_PRICING
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+logger = logging.getLogger("sdlc")
+if METRICS_JSON_LOGS:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1.0, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+                self._histograms[key] = histogram
+            for index, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render_prometheus(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: dict(value, counts=list(value["counts"])) for key, value in self._histograms.items()}
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{format_labels(labels)} {value:g}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            header(name, "histogram")
+            for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+            lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']:g}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("sdlc_stage_duration_seconds", "Wall-clock time per pipeline stage")
+metrics.describe("sdlc_llm_time_to_first_token_seconds", "Time until the first streamed token arrived")
+metrics.describe("sdlc_llm_requests_total", "LLM calls by stage and outcome")
+metrics.describe("sdlc_llm_tokens_total", "Prompt and completion tokens by model and stage")
+metrics.describe("sdlc_llm_cost_usd_total", "Estimated spend by model and stage")
+metrics.describe("sdlc_llm_finish_reason_total", "Completion finish reasons")
+metrics.describe("sdlc_cache_requests_total", "Response cache lookups by result")
+metrics.describe("sdlc_errors_total", "Errors by stage")
+metrics.describe("sdlc_llm_coalesced_total", "Calls served by an identical in-flight request")
+metrics.describe("sdlc_llm_continuations_total", "Follow-up calls resuming replies cut off at max_tokens")
+metrics.describe("sdlc_traffic_exchanges_total", "API exchanges recorded to or replayed from the traffic log")
+metrics.describe("sdlc_model_route_total", "Model routing decisions by stage, model and decision")
+metrics.describe("sdlc_llm_retries_total", "Retried OpenAI calls by error type")
+metrics.describe("sdlc_scheduler_wait_seconds", "Time spent waiting for rate-limit capacity")
+metrics.describe("sdlc_stage_graph_nodes_total", "Stage graph nodes by outcome (ran or memoized)")
+metrics.describe("sdlc_admission_total", "UI handler admissions by kind and outcome")
+metrics.describe("sdlc_admission_wait_seconds", "Time expensive handlers waited in the admission queue")
+metrics.describe("sdlc_speculation_total", "Speculative next-stage runs by outcome")
+metrics.describe("sdlc_startup_phase_seconds", "Time spent in each startup phase")
+
+
+def log_event(event, **fields):
+    if METRICS_JSON_LOGS:
+        logger.info(json.dumps({"event": event, "ts": time.time(), **fields}, default=str))
+
+
+@contextmanager
+def track_stage(stage, **fields):
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        metrics.inc("sdlc_errors_total", stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe("sdlc_stage_duration_seconds", duration, stage=stage)
+        log_event("stage", stage=stage, duration_s=round(duration, 4), outcome=outcome, **fields)
+
+
+def estimate_tokens(text):
+    # The API's tokenizer averages about four characters per token for English and code
+    return max(1, len(text) // 4) if text else 0
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    pricing = MODEL_PRICING.get(model or "")
+    if not pricing:
+        return 0.0
+    return (prompt_tokens * pricing["prompt"] + completion_tokens * pricing["completion"]) / 1000.0
+
+
+def record_llm_call(model, stage, outcome, duration, prompt_tokens=0, completion_tokens=0,
+                    finish_reason=None, error=None):
+    metrics.inc("sdlc_llm_requests_total", model=model or "", stage=stage, outcome=outcome)
+    if outcome == "error":
+        metrics.inc("sdlc_errors_total", stage=stage)
+    if outcome in ("ok", "error"):
+        metrics.observe("sdlc_stage_duration_seconds", duration, stage=stage)
+    cost = estimate_cost(model, prompt_tokens, completion_tokens) if outcome == "ok" else 0.0
+    if outcome == "ok":
+        metrics.inc("sdlc_llm_tokens_total", prompt_tokens, model=model or "", stage=stage, kind="prompt")
+        metrics.inc("sdlc_llm_tokens_total", completion_tokens, model=model or "", stage=stage, kind="completion")
+        metrics.inc("sdlc_llm_cost_usd_total", cost, model=model or "", stage=stage)
+    if finish_reason:
+        metrics.inc("sdlc_llm_finish_reason_total", finish_reason=finish_reason, stage=stage)
+    log_event(
+        "llm_call", model=model, stage=stage, outcome=outcome, duration_s=round(duration, 4),
+        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+        finish_reason=finish_reason, cost_usd=round(cost, 6), error=error
+    )
+
+
+def record_cache_lookup(stage, hit):
+    metrics.inc("sdlc_cache_requests_total", stage=stage, result="hit" if hit else "miss")
@@ -0,0 +1,189 @@
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DOT_TEMPLATE = '''```dot
+digraph {name} {{
+    rankdir=LR;
+    Sensor{index} -> Controller{index};
+    Controller{index} -> Actuator{index};
+    Controller{index} -> Logger{index};
+}}
+```'''
+
+FILE_TEMPLATE = '''#include <cstdint>
+#include <iostream>
+
+namespace embedded {{
+
+// {path}
+uint32_t step_{index}(uint32_t value) {{
+    return value * 2u + {index}u;
+}}
+
+}} // namespace embedded
+'''
+
+
+def design_payload(diagrams):
+    sections = []
+    for index in range(diagrams):
+        sections.append(f"## Section {index + 1}\n\nThe controller samples the sensor and drives the actuator.\n")
+        sections.append(DOT_TEMPLATE.format(name=f"G{index}", index=index))
+    return "\n".join(sections)
+
+
+def code_files(files):
+    structure = {
+        "CMakeLists.txt": "cmake_minimum_required(VERSION 3.10)\nproject(embedded_project)\n",
+        "include/embedded_project.h": "#pragma once\n#include <cstdint>\n",
+        "src/main.cpp": "#include <iostream>\nint main() {\n    std::cout << \"ok\\n\";\n    return 0;\n}\n",
+    }
+    for index in range(files):
+        path = f"src/module_{index}.cpp"
+        structure[path] = FILE_TEMPLATE.format(path=path, index=index)
+    return structure
+
+
+def build_payload(messages, options):
+    system = messages[0]["content"] if messages else ""
+    prompt = messages[-1]["content"] if messages else ""
+    if "file layout" in prompt:
+        manifest = [{"path": path, "purpose": "Generated module"} for path in code_files(options.files)]
+        return json.dumps(manifest)
+    if "write the complete contents of the file" in prompt:
+        path = prompt.split("the file ", 1)[1].split(" ", 1)[0]
+        return FILE_TEMPLATE.format(path=path, index=abs(hash(path)) % 100)
+    if "diagram of the detailed technical specification" in prompt:
+        title = prompt.split("draw the ", 1)[1].split(" diagram", 1)[0]
+        return f"### {title}\n" + DOT_TEMPLATE.format(name="G", index=abs(hash(title)) % 100)
+    if "section of the detailed technical specification" in prompt:
+        title = prompt.split('write the "', 1)[1].split('"', 1)[0]
+        return f"## {title}\n\nThe controller samples the sensor and drives the actuator.\n"
+    if "C++ code" in system or "JSON object" in prompt:
+        payload = json.dumps(code_files(options.files), indent=2)
+        if options.payload == "truncated" or (options.payload == "mixed" and random.random() < 0.5):
+            payload = payload[:int(len(payload) * 0.7)]
+        return f"```json\n{payload}\n```"
+    return design_payload(options.diagrams)
+
+
+def split_tokens(text):
+    # Roughly four characters per token, which is what the real API averages for English
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    options = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/health"):
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        options = self.options
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        time.sleep(options.latency + options.model_latency.get(request.get("model"), 0.0))
+        if random.random() < options.failure_rate:
+            status = random.choice([429, 500, 503])
+            self._send_json(status, {"error": {"message": "Simulated failure", "type": "server_error"}},
+                            {"Retry-After": "1"} if status == 429 else None)
+            return
+
+        messages = request.get("messages", [])
+        resume_from = 0
+        if len(messages) >= 4 and messages[-2].get("role") == "assistant":
+            # A continuation: resume the same payload, repeating a little of the tail like real models do
+            resume_from = max(0, len(messages[-2]["content"]) - 16)
+            messages = messages[:-2]
+        content = build_payload(messages, options)[resume_from:]
+        tokens = split_tokens(content)
+        max_tokens = request.get("max_tokens") or len(tokens)
+        finish_reason = "length" if len(tokens) > max_tokens else "stop"
+        tokens = tokens[:max_tokens]
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                 "total_tokens": prompt_tokens + len(tokens)}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model") or "mock-model"
+        delay = 1.0 / options.token_rate if options.token_rate > 0 else 0
+
+        if not request.get("stream"):
+            time.sleep(delay * len(tokens))
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": finish_reason}],
+                "usage": usage
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for index, token in enumerate(tokens):
+            chunk = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": token},
+                             "finish_reason": finish_reason if index == len(tokens) - 1 else None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Tokens per second, 0 for instant")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--payload", choices=["valid", "truncated", "mixed"], default="valid")
+    parser.add_argument("--diagrams", type=int, default=4, help="Dot blocks per design response")
+    parser.add_argument("--files", type=int, default=6, help="Extra source files per code response")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="Extra latency for one model, to exercise fallback routing; repeatable")
+    options = parser.parse_args(argv)
+    options.model_latency = {
+        model: float(seconds) for model, seconds in (item.split("=", 1) for item in options.model_latency)
+    }
+    return options
+
+
+def serve(options):
+    MockOpenAIHandler.options = options
+    server = ThreadingHTTPServer((options.host, options.port), MockOpenAIHandler)
+    server.daemon_threads = True
+    print(f"Mock OpenAI server listening on http://{options.host}:{options.port}/v1", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(parse_args())
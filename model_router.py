@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+
+from metrics import log_event, metrics
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class ModelRouter:
+    # Picks the model for each call from the stage's profile. The primary serves the stage unless
+    # its recent calls for that stage are over the profile's latency SLO (p90) or mostly failing;
+    # then the fallback takes over, and one call every probe_interval_seconds still goes to the
+    # primary so it can win the stage back once it recovers
+    def __init__(self, window_seconds=300, min_samples=5, max_error_rate=0.5, probe_interval_seconds=30):
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.probe_interval_seconds = probe_interval_seconds
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._routes = {}
+        self._probed = {}
+
+    def record(self, stage, model, seconds, ok):
+        with self._lock:
+            samples = self._samples.setdefault((stage, model), deque(maxlen=200))
+            samples.append((time.monotonic(), seconds, ok))
+
+    def _recent(self, stage, model):
+        samples = self._samples.get((stage, model))
+        if not samples:
+            return []
+        cutoff = time.monotonic() - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return list(samples)
+
+    def _unhealthy(self, stage, model, latency_slo):
+        # Returns why the model should not serve the stage right now, or None
+        samples = self._recent(stage, model)
+        if len(samples) < self.min_samples:
+            return None
+        if sum(1 for _, _, ok in samples if not ok) / len(samples) > self.max_error_rate:
+            return "errors"
+        if latency_slo and percentile([seconds for _, seconds, ok in samples if ok], 90) > latency_slo:
+            return "latency"
+        return None
+
+    def choose(self, stage, profile):
+        primary = profile["model"]
+        fallback = profile.get("fallback")
+        if not fallback or fallback == primary:
+            self._routes.setdefault(stage, primary)
+            return primary
+        now = time.monotonic()
+        with self._lock:
+            reason = self._unhealthy(stage, primary, profile.get("latency_slo"))
+            if reason is None:
+                model, decision = primary, "primary"
+            elif now - self._probed.get(stage, 0.0) >= self.probe_interval_seconds:
+                self._probed[stage] = now
+                model, decision = primary, "probe"
+            else:
+                model, decision = fallback, f"fallback_{reason}"
+            route = primary if reason is None else fallback
+            switched = self._routes.get(stage, primary) != route
+            self._routes[stage] = route
+        metrics.inc("sdlc_model_route_total", stage=stage, model=model, decision=decision)
+        if switched:
+            print(f"Routing {stage} to {route}" + (f": {primary} {reason}" if reason else ": primary recovered"))
+            log_event("model_route", stage=stage, model=route, primary=primary, reason=reason or "recovered")
+        return model
+
+    def route(self, stage, profile):
+        # The model the stage is currently routed to, without counting as a call
+        with self._lock:
+            return self._routes.get(stage, profile["model"])
+
+    def report(self):
+        with self._lock:
+            keys = list(self._samples)
+            report = {}
+            for stage, model in keys:
+                samples = self._recent(stage, model)
+                latencies = [seconds for _, seconds, ok in samples if ok]
+                entry = report.setdefault(stage, {"route": self._routes.get(stage), "models": {}})
+                entry["models"][model] = {
+                    "calls": len(samples),
+                    "error_rate": round(sum(1 for _, _, ok in samples if not ok) / len(samples), 3) if samples else 0.0,
+                    "p50_s": round(percentile(latencies, 50), 3),
+                    "p90_s": round(percentile(latencies, 90), 3)
+                }
+        return report
@@ -0,0 +1,214 @@
+import difflib
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from diagrams import extract_dot_blocks
+
+STATE_ARTIFACTS = ("requirements", "hld", "technical_design")
+CODE_PREFIX = "code/"
+DIAGRAM_PREFIX = "diagrams/"
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def state_artifacts(state, diagrams=None):
+    # Flatten a session state into named text artifacts; every generated file and diagram
+    # is its own artifact so an unchanged one is stored once across all versions
+    artifacts = {name: state.get(name) or "" for name in STATE_ARTIFACTS}
+    for path, content in (state.get("current_structure") or {}).items():
+        artifacts[CODE_PREFIX + path] = content
+    for stage, sources in (state.get("diagram_sources") or {}).items():
+        for index, source in enumerate(sources):
+            artifacts[f"{DIAGRAM_PREFIX}{stage}/{index + 1}.dot"] = source
+    for stage, svgs in (diagrams or {}).items():
+        for index, svg in enumerate(svgs):
+            artifacts[f"{DIAGRAM_PREFIX}{stage}/{index + 1}.svg"] = svg
+    return artifacts
+
+
+def artifacts_to_state(artifacts):
+    # Inverse of state_artifacts: returns (state fields, {stage: [svg, ...]})
+    state = {name: artifacts.get(name, "") for name in STATE_ARTIFACTS}
+    state["current_structure"] = {
+        name[len(CODE_PREFIX):]: content for name, content in artifacts.items() if name.startswith(CODE_PREFIX)
+    }
+    # Versions saved before the sources were kept still have the dot fences in their text
+    state["diagram_sources"] = {stage: extract_dot_blocks(state[stage]) for stage in ("hld", "technical_design")}
+    sources = {}
+    diagrams = {}
+    for name in sorted(artifacts, key=lambda name: (name.rsplit("/", 1)[0], len(name), name)):
+        if name.startswith(DIAGRAM_PREFIX):
+            stage = name[len(DIAGRAM_PREFIX):].split("/", 1)[0]
+            target = sources if name.endswith(".dot") else diagrams
+            target.setdefault(stage, []).append(artifacts[name])
+    state["diagram_sources"].update(sources)
+    return state, diagrams
+
+
+class ProjectStore:
+    # Versioned project history: versions are manifests of artifact name -> content hash,
+    # and contents live once in a compressed, content-addressed blob table
+    def __init__(self, path, max_versions=50):
+        self.path = path
+        self.max_versions = max_versions
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        # Must be set before the first table exists to let pruning hand pages back to the OS
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "hash TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, project TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS version_artifacts ("
+            "version_id INTEGER NOT NULL, name TEXT NOT NULL, hash TEXT NOT NULL, "
+            "PRIMARY KEY (version_id, name))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_versions_project ON versions(project, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_hash ON version_artifacts(hash)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _manifest(self, conn, version_id):
+        return dict(conn.execute(
+            "SELECT name, hash FROM version_artifacts WHERE version_id = ?", (version_id,)
+        ).fetchall())
+
+    def _latest_id(self, conn, project):
+        row = conn.execute(
+            "SELECT MAX(id) FROM versions WHERE project = ?", (project,)
+        ).fetchone()
+        return row[0]
+
+    def save(self, project, artifacts):
+        # Returns (version_id, created); saving an unchanged project does not add a version
+        manifest = {name: content_hash(text) for name, text in artifacts.items()}
+        conn = self._connection()
+        with conn:
+            latest = self._latest_id(conn, project)
+            if latest is not None and self._manifest(conn, latest) == manifest:
+                return latest, False
+            conn.executemany(
+                "INSERT OR IGNORE INTO blobs (hash, data, size) VALUES (?, ?, ?)",
+                [
+                    (manifest[name], zlib.compress(text.encode("utf-8")), len(text.encode("utf-8")))
+                    for name, text in artifacts.items()
+                ]
+            )
+            version_id = conn.execute(
+                "INSERT INTO versions (project, created_at) VALUES (?, ?)", (project, time.time())
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO version_artifacts (version_id, name, hash) VALUES (?, ?, ?)",
+                [(version_id, name, digest) for name, digest in manifest.items()]
+            )
+            pruned = self._prune(conn, project)
+        if pruned:
+            conn.execute("PRAGMA incremental_vacuum")
+        return version_id, True
+
+    def _prune(self, conn, project):
+        if not self.max_versions:
+            return False
+        expired = [row[0] for row in conn.execute(
+            "SELECT id FROM versions WHERE project = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (project, self.max_versions)
+        ).fetchall()]
+        if not expired:
+            return False
+        placeholders = ",".join("?" * len(expired))
+        conn.execute(f"DELETE FROM version_artifacts WHERE version_id IN ({placeholders})", expired)
+        conn.execute(f"DELETE FROM versions WHERE id IN ({placeholders})", expired)
+        conn.execute(
+            "DELETE FROM blobs WHERE NOT EXISTS "
+            "(SELECT 1 FROM version_artifacts WHERE version_artifacts.hash = blobs.hash)"
+        )
+        return True
+
+    def load(self, project, version_id=None):
+        # Returns (version_id, artifacts), or (None, {}) if the project has no versions
+        conn = self._connection()
+        if version_id is None:
+            version_id = self._latest_id(conn, project)
+        rows = conn.execute(
+            "SELECT version_artifacts.name, blobs.data FROM version_artifacts "
+            "JOIN versions ON versions.id = version_artifacts.version_id "
+            "JOIN blobs ON blobs.hash = version_artifacts.hash "
+            "WHERE version_artifacts.version_id = ? AND versions.project = ?",
+            (version_id, project)
+        ).fetchall()
+        if not rows:
+            return None, {}
+        return version_id, {name: zlib.decompress(data).decode("utf-8") for name, data in rows}
+
+    def list_versions(self, project):
+        return [
+            {"id": version_id, "created_at": created_at, "artifacts": count, "bytes": size}
+            for version_id, created_at, count, size in self._connection().execute(
+                "SELECT versions.id, versions.created_at, COUNT(blobs.hash), COALESCE(SUM(blobs.size), 0) "
+                "FROM versions JOIN version_artifacts ON version_artifacts.version_id = versions.id "
+                "JOIN blobs ON blobs.hash = version_artifacts.hash "
+                "WHERE versions.project = ? GROUP BY versions.id ORDER BY versions.id DESC",
+                (project,)
+            ).fetchall()
+        ]
+
+    def list_projects(self):
+        return [row[0] for row in self._connection().execute(
+            "SELECT project FROM versions GROUP BY project ORDER BY MAX(id) DESC"
+        ).fetchall()]
+
+    def diff(self, project, old_version_id, new_version_id):
+        # Unified diff of every text artifact that changed; diagrams are only listed
+        old_id, old_artifacts = self.load(project, old_version_id)
+        new_id, new_artifacts = self.load(project, new_version_id)
+        if old_id is None or new_id is None:
+            raise ValueError(f"Unknown version of {project}: {old_version_id if old_id is None else new_version_id}")
+        changed = sorted(
+            name for name in set(old_artifacts) | set(new_artifacts)
+            if old_artifacts.get(name) != new_artifacts.get(name)
+        )
+        sections = []
+        for name in changed:
+            if name.startswith(DIAGRAM_PREFIX):
+                status = "added" if name not in old_artifacts else "removed" if name not in new_artifacts else "changed"
+                sections.append(f"{name}: diagram {status}\n")
+                continue
+            sections.append("\n".join(difflib.unified_diff(
+                old_artifacts.get(name, "").splitlines(),
+                new_artifacts.get(name, "").splitlines(),
+                fromfile=f"v{old_version_id}/{name}",
+                tofile=f"v{new_version_id}/{name}",
+                lineterm=""
+            )) + "\n")
+        return "\n".join(sections)
+
+    def stats(self):
+        versions, projects = self._connection().execute(
+            "SELECT COUNT(*), COUNT(DISTINCT project) FROM versions"
+        ).fetchone()
+        blobs, total = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()
+        return {"projects": projects, "versions": versions, "blobs": blobs, "bytes": total}
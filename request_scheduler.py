@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from config import (
+    OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE, OPENAI_MAX_RETRIES,
+    OPENAI_BACKOFF_BASE_SECONDS, OPENAI_BACKOFF_MAX_SECONDS
+)
+from metrics import metrics
+
+INTERACTIVE = 0
+BATCH = 1
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        # A request larger than the whole bucket is let through once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+
+def is_retryable(error):
+    import openai
+    if isinstance(error, (openai.error.RateLimitError, openai.error.ServiceUnavailableError,
+                          openai.error.Timeout, openai.error.APIConnectionError, openai.error.TryAgain)):
+        return True
+    status = getattr(error, "http_status", None)
+    return isinstance(error, openai.error.APIError) and (status is None or status >= 500)
+
+
+def is_rate_limit(error):
+    import openai
+    return isinstance(error, openai.error.RateLimitError)
+
+
+def retry_after(error):
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    # Shared gate in front of every OpenAI call: requests/min and tokens/min buckets,
+    # strict priority between interactive and batch callers, and retries with backoff
+    def __init__(self, requests_per_minute=OPENAI_REQUESTS_PER_MINUTE, tokens_per_minute=OPENAI_TOKENS_PER_MINUTE,
+                 max_retries=OPENAI_MAX_RETRIES, backoff_base=OPENAI_BACKOFF_BASE_SECONDS,
+                 backoff_max=OPENAI_BACKOFF_MAX_SECONDS):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+    def _try_acquire(self, ticket, estimated_tokens):
+        # Only the highest-priority, oldest waiter may take capacity; everyone else keeps waiting
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if self._waiters[0] != ticket:
+                return 0.05
+            wait = max(self._paused_until - now, self.requests.wait_time(1), self.tokens.wait_time(estimated_tokens))
+            if wait > 0:
+                return wait
+            heapq.heappop(self._waiters)
+            self.requests.level -= 1
+            self.tokens.level -= min(estimated_tokens, self.tokens.capacity)
+            return 0.0
+
+    def _enqueue(self, priority):
+        ticket = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket):
+        with self._lock:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+
+    async def aacquire(self, estimated_tokens, priority=INTERACTIVE):
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, estimated_tokens)
+                if wait == 0.0:
+                    break
+                await asyncio.sleep(min(wait, 1.0))
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        metrics.observe("sdlc_scheduler_wait_seconds", time.monotonic() - start, priority=priority)
+
+    def settle(self, estimated_tokens, actual_tokens):
+        # Return over-reserved tokens once the real usage is known
+        with self._lock:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + estimated_tokens - actual_tokens)
+
+    def _backoff(self, attempt, error):
+        delay = retry_after(error)
+        if delay is None:
+            # Full jitter keeps many clients from retrying in lockstep
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if is_rate_limit(error):
+            # A 429 means the provider is saturated; hold back every caller, not just this one
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        metrics.inc("sdlc_llm_retries_total", error=type(error).__name__)
+        return delay
+
+    async def acall(self, func, estimated_tokens, priority=INTERACTIVE):
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(estimated_tokens, priority)
+            try:
+                return await func()
+            except Exception as e:
+                # A failed attempt used no tokens, so its reservation goes back before any retry takes another
+                self.settle(estimated_tokens, 0)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt, e))
+
+
+default_scheduler = RequestScheduler()
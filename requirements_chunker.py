@@ -0,0 +1,58 @@
+import hashlib
+import re
+from metrics import estimate_tokens
+
+
+def split_paragraphs(text, max_tokens):
+    # Paragraphs larger than a chunk are broken on lines, then on characters
+    paragraphs = []
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            paragraphs.append(paragraph)
+            continue
+        piece = ""
+        for line in paragraph.split("\n"):
+            while estimate_tokens(line) > max_tokens:
+                if piece:
+                    paragraphs.append(piece)
+                    piece = ""
+                paragraphs.append(line[:max_tokens * 4])
+                line = line[max_tokens * 4:]
+            if piece and estimate_tokens(piece) + estimate_tokens(line) > max_tokens:
+                paragraphs.append(piece)
+                piece = ""
+            piece = f"{piece}\n{line}" if piece else line
+        if piece:
+            paragraphs.append(piece)
+    return paragraphs
+
+
+def chunk_requirements(text, max_tokens=3000):
+    # Chunk boundaries are content-defined: a chunk may end after any paragraph whose hash
+    # hits, so editing one section only reshapes the chunks around it and the rest keep
+    # their cached summaries
+    min_tokens = max_tokens // 4
+    chunks = []
+    current = []
+    size = 0
+    for paragraph in split_paragraphs(text, max_tokens):
+        tokens = estimate_tokens(paragraph)
+        if current and size + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += tokens
+        if size >= min_tokens and int(hashlib.sha1(paragraph.encode("utf-8")).hexdigest()[:8], 16) % 4 == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def read_requirements_file(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
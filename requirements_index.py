@@ -0,0 +1,68 @@
+import math
+import re
+from collections import Counter
+from requirements_chunker import chunk_requirements
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[-_.][a-z0-9]+)*')
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or shall should that the this "
+    "to was were will with must may can each all any which when where then than not no into via".split()
+)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, passages, k1=1.5, b=0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = []
+        self.postings = {}
+        for doc_id, passage in enumerate(passages):
+            counts = Counter(tokenize(passage))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = frequency
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    @classmethod
+    def from_text(cls, text, passage_tokens=250):
+        return cls(chunk_requirements(text, passage_tokens) if text.strip() else [])
+
+    def search(self, query, k=5, max_query_terms=64):
+        if not self.passages:
+            return []
+        # Long queries (whole design documents) are reduced to their most frequent indexed terms
+        query_terms = [term for term, _ in Counter(
+            term for term in tokenize(query) if term in self.postings
+        ).most_common(max_query_terms)]
+        total = len(self.passages)
+        scores = {}
+        for term in query_terms:
+            postings = self.postings[term]
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))[:k]
+        # Keep document order so the passages read naturally in the prompt
+        return [self.passages[doc_id] for doc_id in sorted(ranked)]
+
+    def to_dict(self):
+        return {"passages": self.passages, "k1": self.k1, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls([])
+        return cls(data["passages"], data.get("k1", 1.5), data.get("b", 0.75))
+
+
+def format_requirements_context(passages):
+    if not passages:
+        return ""
+    body = "\n\n".join(f"[R{index + 1}] {passage}" for index, passage in enumerate(passages))
+    return f"\n\nRelevant original requirements (keep the design traceable to these):\n{body}\n"
@@ -1,118 +1,351 @@
+import asyncio
+from startup import startup
+import functools
 import gradio as gr
-import os
-import shutil
-import zipfile
 import json
-from ai_helper import AIHelper
+import os
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from admission import AdmissionController, AdmissionRejected
+from ai_helper import AIHelper, is_error_response, load_openai
+from artifact_store import ArtifactStore
+from code_archive import store_code_archive
+from compile_check import CompileChecker, format_compile_report, verify_and_repair
+from config import (
+    ADMISSION_EXPENSIVE_CONCURRENCY, ADMISSION_MAX_QUEUE, ADMISSION_CHEAP_CONCURRENCY,
+    ADMISSION_CHEAP_TIMEOUT_SECONDS, SESSION_STORE_BACKEND, SESSION_STORE_PATH, SESSION_TTL_SECONDS,
+    ARTIFACT_STORE_DIR, ARTIFACT_STORE_MAX_BYTES, ARTIFACT_STORE_MAX_AGE_SECONDS,
+    ARTIFACT_SWEEP_INTERVAL_SECONDS, GRADIO_TEMP_DIR, DIAGRAM_RENDER_WORKERS, CODEGEN_FANOUT, SERVER_HOST, SERVER_PORT,
+    REQUIREMENTS_PASSAGE_TOKENS, PROJECT_STORE_PATH, PROJECT_STORE_MAX_VERSIONS,
+    SPECULATION_ENABLED, SPECULATION_SESSION_BUDGET, SPECULATION_TTL_SECONDS,
+    COMPILE_CHECK_ENABLED, COMPILE_CHECK_COMMAND, COMPILE_CHECK_FLAGS, COMPILE_CHECK_WORKERS,
+    COMPILE_CHECK_TIMEOUT_SECONDS, COMPILE_CHECK_CACHE_PATH, COMPILE_REPAIR_ROUNDS,
+    LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS
+)
+from diagrams import DOT_BLOCK_PATTERN, DiagramRenderer, extract_dot_blocks, strip_dot_blocks
+from llm_cache import ResponseCache
+from metrics import metrics
+from project_store import ProjectStore, artifacts_to_state, state_artifacts
+from requirements_chunker import read_requirements_file
+from requirements_index import BM25Index
+from session_store import create_session_store
+from speculation import Speculator, fingerprint
 from datetime import datetime
-import re
-import graphviz
 from css import block_css, notice_markdown
 
+startup.checkpoint("imports")
+
+# Read by Gradio when components and the app are created, so it has to be set before either
+os.environ["GRADIO_TEMP_DIR"] = os.path.abspath(GRADIO_TEMP_DIR)
+
 class SDLCApp:
-    def __init__(self):
-        self.ai_helper = AIHelper()
-        self.persistent_storage = {
-            "requirements": "",
-            "hld": "",
-            "technical_design": "",
-            "project_name": "",
-            "timestamp": ""
-        }
-        self.current_structure = {}
-        self.create_interface()
+    def __init__(self, session_store=None):
+        with startup.phase("stores"):
+            self.ai_helper = AIHelper()
+            # Pipeline state lives in the session store, keyed by the client's session hash,
+            # so concurrent users never share it and any app process can serve any request
+            self.sessions = session_store or create_session_store(
+                SESSION_STORE_BACKEND, SESSION_STORE_PATH, SESSION_TTL_SECONDS
+            )
+            # Diagrams and zips are served to the UI straight from the bounded artifact store
+            self.artifacts = ArtifactStore(ARTIFACT_STORE_DIR, ARTIFACT_STORE_MAX_BYTES, ARTIFACT_STORE_MAX_AGE_SECONDS)
+            self.diagram_renderer = DiagramRenderer(self.artifacts, DIAGRAM_RENDER_WORKERS)
+            self.projects = ProjectStore(PROJECT_STORE_PATH, PROJECT_STORE_MAX_VERSIONS)
+            self.admission = AdmissionController(
+                ADMISSION_EXPENSIVE_CONCURRENCY, ADMISSION_MAX_QUEUE,
+                ADMISSION_CHEAP_CONCURRENCY, ADMISSION_CHEAP_TIMEOUT_SECONDS
+            )
+            self.speculator = Speculator(SPECULATION_SESSION_BUDGET, SPECULATION_TTL_SECONDS, self.admission)
+            self.compile_checker = CompileChecker(
+                ResponseCache(COMPILE_CHECK_CACHE_PATH, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS),
+                COMPILE_CHECK_COMMAND, COMPILE_CHECK_FLAGS, COMPILE_CHECK_WORKERS, COMPILE_CHECK_TIMEOUT_SECONDS
+            )
+        self.demo = None
+
+    def interface(self):
+        # Built on first use, so handlers can be driven without the Blocks UI (benchmark, tests)
+        if self.demo is None:
+            with startup.phase("interface"):
+                self.create_interface()
+        return self.demo
+
+    def warm_up(self):
+        # Pay for the OpenAI client import and the first store round trip before reporting ready
+        load_openai()
+        self.sessions.get("readiness-probe")
 
     def extract_and_render_graphviz(self, text):
-        # Extract Graphviz diagram and convert to image
-        diagram_match = re.search(r'```dot(.*?)```', text, re.DOTALL)
-        if diagram_match:
-            diagram = diagram_match.group(1).strip()
-            graph = graphviz.Source(diagram)
-            graph_path = f"graph_{datetime.now().strftime('%Y%m%d_%H%M%S')}.svg"
-            graph.render(filename=graph_path, format='svg', cleanup=False)  # Set cleanup to False
-            # Remove the Graphviz code block from the text
-            text = re.sub(r'```dot.*?```', '', text, flags=re.DOTALL).strip()
-            return text, f"{graph_path}.svg"  # Ensure the correct file path is returned
-        return text, ""
-
-    def save_state(self):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"sdlc_state_{timestamp}.json"
-        with open(filename, 'w') as f:
-            json.dump(self.persistent_storage, f)
-        return filename
-
-    def load_state(self, file):
+        # Strip every Graphviz block from the text and render them all for the gallery
+        return self.diagram_renderer.extract_and_render(text)
+
+    def version_choices(self, project_name, selected=None):
+        labels = [
+            f"v{version['id']} · {datetime.fromtimestamp(version['created_at']):%Y-%m-%d %H:%M:%S} · "
+            f"{version['artifacts']} artifacts"
+            for version in self.projects.list_versions(project_name)
+        ] if project_name else []
+        value = next((label for label in labels if label.startswith(f"v{selected} ")), None)
+        return gr.Dropdown.update(choices=labels, value=value)
+
+    def refresh_versions(self, project_name):
+        return self.version_choices(project_name), self.version_choices(project_name)
+
+    def save_state(self, project_name, request: gr.Request):
+        state = self.sessions.get(request.session_hash)
+        project_name = project_name or state["project_name"]
+        if not project_name:
+            raise gr.Error("Enter a project name before saving")
+        state["project_name"] = project_name
+        self.sessions.put(request.session_hash, state)
+        diagrams = {}
+        # The textboxes hold the text with the dot fences stripped, so render from the kept sources
+        for stage, sources in (state.get("diagram_sources") or {}).items():
+            diagrams[stage] = []
+            for path in self.diagram_renderer.render_all(sources):
+                with open(path, 'r') as f:
+                    diagrams[stage].append(f.read())
+        version_id, created = self.projects.save(project_name, state_artifacts(state, diagrams))
+        status = f"Saved version {version_id}" if created else f"No changes since version {version_id}"
+        return self.version_choices(project_name, version_id), self.version_choices(project_name), status
+
+    def restore_diagrams(self, svgs):
+        return [self.artifacts.put(svg.encode("utf-8"), "diagram.svg") for svg in svgs]
+
+    def load_version(self, project_name, version_label, request: gr.Request):
+        if not project_name or not version_label:
+            raise gr.Error("Select a version to load")
+        version_id, artifacts = self.projects.load(project_name, int(version_label.split()[0][1:]))
+        if version_id is None:
+            raise gr.Error(f"Version not found: {version_label}")
+        loaded, diagrams = artifacts_to_state(artifacts)
+        state = self.sessions.get(request.session_hash)
+        state.update(loaded, project_name=project_name)
+        state["requirements_index"] = BM25Index.from_text(
+            state["requirements"], REQUIREMENTS_PASSAGE_TOKENS
+        ).to_dict()
+        self.sessions.put(request.session_hash, state)
+        current_structure = state["current_structure"]
+        return (
+            state["requirements"],
+            strip_dot_blocks(state["hld"]),
+            self.restore_diagrams(diagrams.get("hld", [])),
+            strip_dot_blocks(state["technical_design"]),
+            self.restore_diagrams(diagrams.get("technical_design", [])),
+            store_code_archive(current_structure, self.artifacts) if current_structure else None,
+            gr.Dropdown.update(choices=list(current_structure.keys()), value=None),
+            f"Loaded version {version_id}"
+        )
+
+    def diff_versions(self, project_name, new_label, old_label):
+        if not project_name or not new_label or not old_label:
+            raise gr.Error("Select two versions to compare")
+        return self.projects.diff(
+            project_name, int(old_label.split()[0][1:]), int(new_label.split()[0][1:])
+        ) or "No differences"
+
+    def load_state(self, file, request: gr.Request):
         try:
             with open(file.name, 'r') as f:
-                self.persistent_storage = json.load(f)
+                state = self.sessions.get(request.session_hash)
+                state.update(json.load(f))
+            if "diagram_sources" not in state:
+                state["diagram_sources"] = {
+                    stage: extract_dot_blocks(state[stage]) for stage in ("hld", "technical_design")
+                }
+            if not state.get("requirements_index"):
+                state["requirements_index"] = BM25Index.from_text(
+                    state["requirements"], REQUIREMENTS_PASSAGE_TOKENS
+                ).to_dict()
+            self.sessions.put(request.session_hash, state)
             return (
-                self.persistent_storage["requirements"],
-                self.persistent_storage["hld"],
-                self.persistent_storage["technical_design"]
+                state["requirements"],
+                state["hld"],
+                state["technical_design"]
             )
         except Exception as e:
             return "Error loading state", "", ""
 
-    def save_requirements(self, project_name, requirements):
-        self.persistent_storage["project_name"] = project_name
-        self.persistent_storage["requirements"] = requirements
-        hld = self.ai_helper.generate_hld(requirements)
-        self.persistent_storage["hld"] = hld
-        rendered_hld, diagram_path = self.extract_and_render_graphviz(hld)
-        return gr.Tabs(selected="1"), rendered_hld, diagram_path
-
-    def save_hld(self, hld):
-        self.persistent_storage["hld"] = hld
-        technical_design = self.ai_helper.generate_technical_design(hld)
-        self.persistent_storage["technical_design"] = technical_design
-        rendered_technical, diagram_path = self.extract_and_render_graphviz(technical_design)
-        return gr.Tabs(selected="2"), rendered_technical, diagram_path
-
-    def save_technical_design(self, technical_design):
-        self.persistent_storage["technical_design"] = technical_design
+    async def stream_artifact(self, chunks, tab_id, session_id, storage_key):
+        # Yield partial text as it arrives and render diagrams as each dot fence closes
+        text = ""
+        rendered_blocks = 0
+        async for chunk in chunks:
+            if is_error_response(chunk):
+                # Surface the failure instead of saving it as the next stage's input
+                raise gr.Error(chunk)
+            text += chunk
+            closed_blocks = len(DOT_BLOCK_PATTERN.findall(text))
+            # The gallery is only sent when it changes: Gradio re-reads and hashes every file it is given
+            gallery = gr.update()
+            if closed_blocks > rendered_blocks:
+                rendered_blocks = closed_blocks
+                _, gallery = await asyncio.to_thread(self.extract_and_render_graphviz, text)
+            yield gr.Tabs(selected=tab_id), text, gallery
+        state = self.sessions.get(session_id)
+        state[storage_key] = text
+        # Kept apart from the text, which the user may edit without its dot fences before saving
+        state.setdefault("diagram_sources", {})[storage_key] = extract_dot_blocks(text)
+        self.sessions.put(session_id, state)
+        rendered, diagram_paths = await asyncio.to_thread(self.extract_and_render_graphviz, text)
+        yield gr.Tabs(selected=tab_id), rendered, diagram_paths
+
+    def speculate(self, session_id, stage, artifact, use_cache):
+        # The key covers everything the next prompt depends on, so an edited artifact (or changed
+        # requirements or cache setting) never adopts a stale run
+        state = self.sessions.get(session_id)
+        requirements_index = BM25Index.from_dict(state["requirements_index"])
+        if stage == "technical_design":
+            factory = lambda: self.ai_helper.astream_technical_design(
+                artifact, use_cache=use_cache, requirements_index=requirements_index
+            )
+        else:
+            factory = lambda: self.ai_helper.astream_code_structure(
+                artifact, use_cache=use_cache, requirements_index=requirements_index
+            )
+        self.speculator.start(session_id, stage, fingerprint(artifact, state["requirements"], use_cache), factory)
+
+    def adopt_speculation(self, session_id, stage, artifact, use_cache):
+        state = self.sessions.get(session_id)
+        return self.speculator.take(session_id, stage, fingerprint(artifact, state["requirements"], use_cache))
+
+    async def admitted(self, session_id, body, waiting_update):
+        # Runs an LLM-bound handler body once admission lets it through, showing the queue
+        # position and ETA in the handler's main output until then
+        try:
+            ticket = self.admission.enqueue(session_id)
+        except AdmissionRejected as e:
+            raise gr.Error(str(e))
+        try:
+            async for position, eta in self.admission.wait(ticket):
+                yield waiting_update(f"Waiting in queue: position {position}, about {eta:.0f}s")
+            async for update in body():
+                yield update
+        finally:
+            self.admission.release(ticket)
+
+    def cheap(self, handler):
+        # functools.wraps keeps the signature visible, so Gradio still injects gr.Request
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            try:
+                with self.admission.cheap():
+                    return handler(*args, **kwargs)
+            except AdmissionRejected as e:
+                raise gr.Error(str(e))
+        return wrapper
+
+    async def save_requirements(self, project_name, requirements, bypass_cache=False, speculate=False,
+                                request: gr.Request = None):
+        state = self.sessions.get(request.session_hash)
+        state["project_name"] = project_name
+        state["requirements"] = requirements
+        state["requirements_index"] = BM25Index.from_text(requirements, REQUIREMENTS_PASSAGE_TOKENS).to_dict()
+        self.sessions.put(request.session_hash, state)
+        chunks = self.ai_helper.astream_hld(requirements, use_cache=not bypass_cache)
+        update = None
+        async for update in self.admitted(
+            request.session_hash,
+            lambda: self.stream_artifact(chunks, "1", request.session_hash, "hld"),
+            lambda status: (gr.Tabs(selected="1"), status, [])
+        ):
+            yield update
+        if speculate and update is not None:
+            # update[1] is exactly what the HLD textbox will submit if the user accepts it
+            self.speculate(request.session_hash, "technical_design", update[1], not bypass_cache)
+
+    async def save_hld(self, hld, bypass_cache=False, speculate=False, request: gr.Request = None):
+        state = self.sessions.get(request.session_hash)
+        state["hld"] = hld
+        self.sessions.put(request.session_hash, state)
+        adopted = self.adopt_speculation(request.session_hash, "technical_design", hld, not bypass_cache)
+        chunks = adopted or self.ai_helper.astream_technical_design(
+            hld, use_cache=not bypass_cache, requirements_index=BM25Index.from_dict(state["requirements_index"])
+        )
+        body = lambda: self.stream_artifact(chunks, "2", request.session_hash, "technical_design")
+        # An adopted speculative run already holds an admission slot, so it does not queue again
+        updates = body() if adopted else self.admitted(
+            request.session_hash, body, lambda status: (gr.Tabs(selected="2"), status, [])
+        )
+        update = None
+        async for update in updates:
+            yield update
+        if speculate and update is not None:
+            self.speculate(request.session_hash, "code", update[1], not bypass_cache)
+
+    def save_technical_design(self, technical_design, request: gr.Request):
+        state = self.sessions.get(request.session_hash)
+        state["technical_design"] = technical_design
+        self.sessions.put(request.session_hash, state)
         return gr.Tabs(selected="3")
 
-    def generate_code(self):
-        code_structure = self.ai_helper.generate_code_structure(self.persistent_storage["technical_design"])
-        
-        # Create a directory for the generated code
-        project_dir = f"generated_code_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        os.makedirs(project_dir, exist_ok=True)
+    async def generate_code(self, bypass_cache=False, fanout=False, compile_check=False, request: gr.Request = None):
+        state = self.sessions.get(request.session_hash)
+        if fanout:
+            # The speculative run streamed the single-shot prompt, which fan-out does not use
+            self.speculator.discard(request.session_hash, "code")
+            adopted = None
+        else:
+            adopted = self.adopt_speculation(request.session_hash, "code", state["technical_design"], not bypass_cache)
+        body = lambda: self._generate_code(adopted, bypass_cache, fanout, compile_check, request)
+        # An adopted run already holds an admission slot; compile repairs make new calls, so they still queue
+        updates = body() if adopted and not compile_check else self.admitted(
+            request.session_hash, body, lambda status: (None, gr.update(), status, gr.update())
+        )
+        async for update in updates:
+            yield update
+
+    async def _generate_code(self, adopted, bypass_cache, fanout, compile_check, request):
+        state = self.sessions.get(request.session_hash)
+        requirements_index = BM25Index.from_dict(state["requirements_index"])
+        current_structure = {}
+        if fanout:
+            code_structure = await self.ai_helper.agenerate_code_structure(
+                state["technical_design"], use_cache=not bypass_cache, fanout=True,
+                requirements_index=requirements_index
+            )
+            current_structure = json.loads(code_structure)
+        else:
+            # Populate the file list and preview while the model is still writing
+            structures = adopted or self.ai_helper.astream_code_structure(
+                state["technical_design"], use_cache=not bypass_cache, requirements_index=requirements_index
+            )
+            async for current_structure in structures:
+                self.update_session(request.session_hash, current_structure=current_structure)
+                latest = list(current_structure)[-1]
+                yield (
+                    None,
+                    gr.Dropdown.update(choices=list(current_structure.keys()), value=latest),
+                    current_structure[latest],
+                    ""
+                )
+
+        compile_report = ""
+        if compile_check and current_structure:
+            yield None, gr.update(), gr.update(), "Checking that the code compiles..."
+            current_structure, report = await verify_and_repair(
+                current_structure, self.ai_helper, self.compile_checker, COMPILE_REPAIR_ROUNDS, not bypass_cache
+            )
+            compile_report = format_compile_report(report)
 
         try:
-            # Parse the generated code structure
-            self.current_structure = json.loads(code_structure)
-            
-            # Ensure proper file organization
-            for filepath, content in self.current_structure.items():
-                # Create full path and ensure directory exists
-                full_path = os.path.join(project_dir, filepath)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                
-                # Write content with proper line endings
-                with open(full_path, 'w', newline='\n') as f:
-                    f.write(content)
-
-            # Create zip file with proper directory structure
-            zip_filename = f"{project_dir}.zip"
-            with zipfile.ZipFile(zip_filename, 'w') as zipf:
-                for root, _, files in os.walk(project_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, project_dir)
-                        zipf.write(file_path, arcname)
-
-            shutil.rmtree(project_dir)
-            return zip_filename, gr.Dropdown.update(choices=list(self.current_structure.keys())), ""
+            zip_filename = await asyncio.to_thread(store_code_archive, current_structure, self.artifacts)
+            self.update_session(request.session_hash, current_structure=current_structure)
+            yield zip_filename, gr.Dropdown.update(choices=list(current_structure.keys())), gr.update(), compile_report
 
         except Exception as e:
             print(f"Error generating code: {str(e)}")
-            return None, gr.Dropdown.update(choices=[]), "Failed to generate code structure"
+            yield None, gr.Dropdown.update(choices=[]), "Failed to generate code structure", compile_report
 
-    def update_preview(self, selected_file):
-        if selected_file in self.current_structure:
-            return self.current_structure[selected_file]
+    def update_session(self, session_id, **fields):
+        # Re-read before writing, so fields another handler changed meanwhile are kept
+        state = self.sessions.get(session_id)
+        state.update(fields)
+        self.sessions.put(session_id, state)
+
+    def update_preview(self, selected_file, request: gr.Request):
+        current_structure = self.sessions.get(request.session_hash)["current_structure"]
+        if selected_file in current_structure:
+            return current_structure[selected_file]
         return ""
 
     def create_interface(self):
@@ -125,25 +358,50 @@ class SDLCApp:
                         project_name = gr.Textbox(label="Project Name")
                         requirements_input = gr.Textbox(label="Enter Requirements", lines=10)
                         requirements_file = gr.File(label="Upload Requirements File")
-                        next_button_1 = gr.Button("Generate HLD")
+                        with gr.Row():
+                            bypass_cache = gr.Checkbox(label="Bypass response cache", value=False)
+                            speculate = gr.Checkbox(
+                                label="Prepare the next stage in the background",
+                                value=SPECULATION_ENABLED
+                            )
+                        with gr.Row():
+                            next_button_1 = gr.Button("Generate HLD")
+                            stop_button_1 = gr.Button("Stop")
                         
                         with gr.Accordion("State Management", open=False):
-                            save_state_button = gr.Button("Save Current State")
-                            load_state_button = gr.File(label="Load Previous State")
-                            state_output = gr.File(label="Saved State")
+                            with gr.Row():
+                                save_state_button = gr.Button("Save Version")
+                                load_version_button = gr.Button("Load Version")
+                                diff_button = gr.Button("Compare")
+                            with gr.Row():
+                                version_dropdown = gr.Dropdown(label="Version", choices=[], interactive=True)
+                                compare_dropdown = gr.Dropdown(label="Compare Against", choices=[], interactive=True)
+                            state_status = gr.Markdown()
+                            diff_output = gr.Textbox(label="Differences", lines=15, interactive=False)
+                            load_state_button = gr.File(label="Import State File (JSON)")
 
                     with gr.TabItem("High-Level Design (HLD)", id="1"):
                         hld_input = gr.Textbox(label="High-Level Design", lines=10)
-                        hld_diagram = gr.Image(label="HLD Diagram")
-                        next_button_2 = gr.Button("Generate Technical Design")
+                        hld_diagram = gr.Gallery(label="HLD Diagrams", columns=2, height="auto")
+                        with gr.Row():
+                            next_button_2 = gr.Button("Generate Technical Design")
+                            stop_button_2 = gr.Button("Stop")
 
                     with gr.TabItem("Technical Design", id="2"):
                         technical_design_input = gr.Textbox(label="Technical Design", lines=10)
-                        technical_design_diagram = gr.Image(label="Technical Design Diagram")
+                        technical_design_diagram = gr.Gallery(label="Technical Design Diagrams", columns=2, height="auto")
                         next_button_3 = gr.Button("Next")
 
                     with gr.TabItem("Code Generation" , id="3"):
                         generate_button = gr.Button("Generate Code")
+                        fanout_checkbox = gr.Checkbox(
+                            label="Plan files first and generate them in parallel",
+                            value=CODEGEN_FANOUT
+                        )
+                        compile_check_checkbox = gr.Checkbox(
+                            label="Check that the code compiles and regenerate failing files",
+                            value=COMPILE_CHECK_ENABLED
+                        )
                         with gr.Row():
                             with gr.Column():
                                 download_link = gr.File(label="Download Code")
@@ -158,49 +416,119 @@ class SDLCApp:
                                     lines=20,
                                     interactive=False
                                 )
+                        compile_report = gr.Textbox(label="Compile Check", lines=8, interactive=False)
 
                     # Event handlers
-                    next_button_1.click(lambda x: gr.Tabs(selected="1"), None,tabs).then(
+                    hld_event = next_button_1.click(lambda x: gr.Tabs(selected="1"), None,tabs).then(
                         self.save_requirements,
-                        inputs=[project_name, requirements_input],
+                        inputs=[project_name, requirements_input, bypass_cache, speculate],
                         outputs=[tabs, hld_input, hld_diagram]
                     )
-                    next_button_2.click(lambda x: gr.Tabs(selected="2"), None,tabs).then(
+                    technical_event = next_button_2.click(lambda x: gr.Tabs(selected="2"), None,tabs).then(
                         self.save_hld,
-                        inputs=[hld_input],
+                        inputs=[hld_input, bypass_cache, speculate],
                         outputs=[tabs, technical_design_input, technical_design_diagram]
                     )
+                    stop_button_1.click(None, None, None, cancels=[hld_event])
+                    stop_button_2.click(None, None, None, cancels=[technical_event])
                     next_button_3.click(lambda x: gr.Tabs(selected="3"), None,tabs).then(
-                        self.save_technical_design,
+                        self.cheap(self.save_technical_design),
                         inputs=[technical_design_input],
-                        outputs=tabs
+                        outputs=tabs,
+                        queue=False
                     )
                     generate_button.click(
                         self.generate_code,
-                        outputs=[download_link, file_dropdown, code_preview]
+                        inputs=[bypass_cache, fanout_checkbox, compile_check_checkbox],
+                        outputs=[download_link, file_dropdown, code_preview, compile_report]
                     )
+                    # Quick handlers skip the shared queue so they never wait behind LLM calls
                     file_dropdown.change(
-                        self.update_preview,
+                        self.cheap(self.update_preview),
                         inputs=[file_dropdown],
-                        outputs=[code_preview]
+                        outputs=[code_preview],
+                        queue=False
                     )
                     save_state_button.click(
-                        self.save_state,
-                        outputs=state_output
+                        self.cheap(self.save_state),
+                        inputs=[project_name],
+                        outputs=[version_dropdown, compare_dropdown, state_status],
+                        queue=False
+                    )
+                    project_name.blur(
+                        self.cheap(self.refresh_versions),
+                        inputs=[project_name],
+                        outputs=[version_dropdown, compare_dropdown],
+                        queue=False
+                    )
+                    load_version_button.click(
+                        self.cheap(self.load_version),
+                        inputs=[project_name, version_dropdown],
+                        outputs=[
+                            requirements_input, hld_input, hld_diagram, technical_design_input,
+                            technical_design_diagram, download_link, file_dropdown, state_status
+                        ],
+                        queue=False
+                    )
+                    diff_button.click(
+                        self.cheap(self.diff_versions),
+                        inputs=[project_name, version_dropdown, compare_dropdown],
+                        outputs=diff_output,
+                        queue=False
                     )
                     load_state_button.change(
-                        self.load_state,
+                        self.cheap(self.load_state),
                         inputs=[load_state_button],
-                        outputs=[requirements_input, hld_input, technical_design_input]
+                        outputs=[requirements_input, hld_input, technical_design_input],
+                        queue=False
                     )
                     requirements_file.change(
-                        lambda file: (open(file.name).read() if file else ""),
+                        lambda file: (read_requirements_file(file.name) if file else ""),
                         inputs=requirements_file,
                         outputs=requirements_input
                     )
 
+    def create_server(self):
+        # Serve Prometheus metrics and health probes next to the Gradio UI on the same port
+        server = FastAPI()
+
+        @server.get("/metrics")
+        def prometheus_metrics():
+            return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+        @server.get("/healthz")
+        def healthz():
+            return {"status": "ok"}
+
+        @server.get("/routing")
+        def routing():
+            # Which model each stage is routed to, and the latency and error rate behind it
+            return self.ai_helper.router.report()
+
+        @server.get("/readyz")
+        def readyz():
+            return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
+
+        with startup.phase("server"):
+            app = gr.mount_gradio_app(server, self.interface(), path="/")
+
+        # Registered after the mount so it runs once Gradio's own startup (the queue) is done
+        @server.on_event("startup")
+        async def mark_ready():
+            with startup.phase("warm_up"):
+                await asyncio.to_thread(self.warm_up)
+            startup.mark_ready()
+
+        return app
+
     def launch(self):
-        self.demo.launch()
+        import uvicorn
+        # Queueing is required for generator (streaming) handlers
+        # Requests waiting for admission hold a Gradio worker, so the workers must cover the
+        # admission queue too; otherwise Gradio's own FIFO queue would sit in front of it
+        self.interface().queue(concurrency_count=ADMISSION_EXPENSIVE_CONCURRENCY + ADMISSION_MAX_QUEUE)
+        self.artifacts.start_sweeper(ARTIFACT_SWEEP_INTERVAL_SECONDS)
+        uvicorn.run(self.create_server(), host=SERVER_HOST, port=SERVER_PORT)
 
 if __name__ == "__main__":
     app = SDLCApp()
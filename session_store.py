@@ -0,0 +1,105 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def new_session_state():
+    return {
+        "requirements": "",
+        "hld": "",
+        "technical_design": "",
+        "project_name": "",
+        "timestamp": "",
+        "current_structure": {},
+        "diagram_sources": {},
+        "requirements_index": None
+    }
+
+
+class InMemorySessionStore:
+    def __init__(self, ttl_seconds=24 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or (self.ttl_seconds and time.time() - entry[1] > self.ttl_seconds):
+                return new_session_state()
+            return copy.deepcopy(entry[0])
+
+    def put(self, session_id, state):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (copy.deepcopy(state), now)
+            if self.ttl_seconds:
+                expired = [key for key, (_, updated) in self._sessions.items() if now - updated > self.ttl_seconds]
+                for key in expired:
+                    del self._sessions[key]
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    # Safe to share between several app processes on the same host or volume
+    def __init__(self, path, ttl_seconds=24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        row = self._connection().execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or (self.ttl_seconds and time.time() - row[1] > self.ttl_seconds):
+            return new_session_state()
+        state = new_session_state()
+        state.update(json.loads(row[0]))
+        return state
+
+    def put(self, session_id, state):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session_id, json.dumps(state), now)
+        )
+        if self.ttl_seconds:
+            conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl_seconds,))
+        conn.commit()
+
+    def delete(self, session_id):
+        conn = self._connection()
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+
+def create_session_store(backend, path=None, ttl_seconds=24 * 3600):
+    if backend == "memory":
+        return InMemorySessionStore(ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, ttl_seconds)
+    raise ValueError(f"Unknown session store backend: {backend}")
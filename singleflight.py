@@ -0,0 +1,66 @@
+import asyncio
+
+
+class AsyncSingleFlight:
+    # Upstream work runs in its own task, so a caller that is cancelled (e.g. the user pressed
+    # Stop) does not take the shared request down with it for everyone else
+    def __init__(self):
+        self._flights = {}
+        self._streams = {}
+
+    async def run(self, key, coroutine_factory):
+        task = self._flights.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(coroutine_factory())
+            self._flights[key] = task
+            task.add_done_callback(lambda _: self._flights.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def stream(self, key, generator_factory):
+        # Returns (shared, chunks); every subscriber replays what has arrived so far, then
+        # follows the live stream
+        flight = self._streams.get(key)
+        shared = flight is not None
+        if not shared:
+            flight = {"chunks": [], "done": False, "error": None, "subscribers": 0, "changed": asyncio.Event()}
+            self._streams[key] = flight
+            flight["task"] = asyncio.ensure_future(self._pump(key, flight, generator_factory()))
+        flight["subscribers"] += 1
+        return shared, self._subscribe(key, flight)
+
+    async def _subscribe(self, key, flight):
+        index = 0
+        try:
+            while True:
+                while index < len(flight["chunks"]):
+                    yield flight["chunks"][index]
+                    index += 1
+                if flight["done"]:
+                    if flight["error"] is not None:
+                        raise flight["error"]
+                    return
+                flight["changed"].clear()
+                await flight["changed"].wait()
+        finally:
+            flight["subscribers"] -= 1
+            # Nobody is listening any more (everyone pressed Stop): stop paying for the stream
+            if flight["subscribers"] == 0 and not flight["done"]:
+                flight["task"].cancel()
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+
+    async def _pump(self, key, flight, generator):
+        try:
+            async for chunk in generator:
+                flight["chunks"].append(chunk)
+                flight["changed"].set()
+        except asyncio.CancelledError:
+            await generator.aclose()
+            raise
+        except Exception as e:
+            flight["error"] = e
+        finally:
+            flight["done"] = True
+            flight["changed"].set()
+            self._streams.pop(key, None)
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import time
+
+from metrics import metrics
+
+
+def fingerprint(*parts):
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class Speculator:
+    # Runs the next pipeline stage in the background as soon as its input exists. A result is
+    # handed over only if the input the user finally submits has the same fingerprint
+    def __init__(self, session_budget=3, ttl_seconds=900, admission=None):
+        # Per session, how many speculative runs may be thrown away within ttl_seconds before
+        # speculation pauses for that session
+        self.session_budget = session_budget
+        self.ttl_seconds = ttl_seconds
+        # Each run holds an admission slot, taken only when one is spare, for as long as it runs
+        self.admission = admission
+        self._jobs = {}
+        self._wasted = {}
+
+    def start(self, session_id, stage, key, generator_factory):
+        self._expire()
+        self.discard(session_id, stage)
+        if self._wasted.get(session_id, (0, 0.0))[0] >= self.session_budget:
+            metrics.inc("sdlc_speculation_total", stage=stage, outcome="over_budget")
+            return False
+        ticket = None
+        if self.admission is not None:
+            ticket = self.admission.try_admit(session_id)
+            if ticket is None:
+                metrics.inc("sdlc_speculation_total", stage=stage, outcome="no_capacity")
+                return False
+        job = {"key": key, "items": [], "done": False, "changed": asyncio.Event(), "started": time.monotonic()}
+        job["task"] = asyncio.ensure_future(self._run(job, generator_factory()))
+        if ticket is not None:
+            # Released when the run ends, adopted or not, so an adopted run stays within the limit
+            job["task"].add_done_callback(lambda _: self.admission.release(ticket))
+        self._jobs[(session_id, stage)] = job
+        metrics.inc("sdlc_speculation_total", stage=stage, outcome="started")
+        return True
+
+    async def _run(self, job, generator):
+        try:
+            async for item in generator:
+                job["items"].append(item)
+                job["changed"].set()
+        except asyncio.CancelledError:
+            await generator.aclose()
+            raise
+        except Exception as e:
+            print(f"Speculative run failed: {str(e)}")
+        finally:
+            job["done"] = True
+            job["changed"].set()
+
+    def take(self, session_id, stage, key):
+        # Returns an async iterator over the speculative output (replayed, then live), or None
+        job = self._jobs.pop((session_id, stage), None)
+        if job is None:
+            return None
+        if job["key"] != key:
+            self._waste(session_id, stage, job)
+            return None
+        metrics.inc("sdlc_speculation_total", stage=stage, outcome="hit" if job["done"] else "joined")
+        return self._follow(job)
+
+    async def _follow(self, job):
+        index = 0
+        try:
+            while True:
+                while index < len(job["items"]):
+                    yield job["items"][index]
+                    index += 1
+                if job["done"]:
+                    return
+                job["changed"].clear()
+                await job["changed"].wait()
+        finally:
+            # The user stopped the stage: the run they adopted has no other consumer
+            if not job["done"]:
+                job["task"].cancel()
+
+    def discard(self, session_id, stage):
+        job = self._jobs.pop((session_id, stage), None)
+        if job is not None:
+            self._waste(session_id, stage, job)
+
+    def _waste(self, session_id, stage, job):
+        job["task"].cancel()
+        self._wasted[session_id] = (self._wasted.get(session_id, (0, 0.0))[0] + 1, time.monotonic())
+        metrics.inc("sdlc_speculation_total", stage=stage, outcome="discarded")
+
+    def _expire(self):
+        now = time.monotonic()
+        for (session_id, stage), job in list(self._jobs.items()):
+            if now - job["started"] > self.ttl_seconds:
+                del self._jobs[(session_id, stage)]
+                self._waste(session_id, stage, job)
+        for session_id, (_, wasted_at) in list(self._wasted.items()):
+            if now - wasted_at > self.ttl_seconds:
+                del self._wasted[session_id]
@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+
+from metrics import metrics
+
+MERGES = {
+    "concat": lambda parts: "\n\n".join(part.strip() for part in parts if part.strip())
+}
+
+
+class StageFailed(Exception):
+    pass
+
+
+class StageGraph:
+    # Runs the nodes of a declarative graph (see STAGE_GRAPH in config.py). run_prompt(name, node,
+    # values, use_cache) performs one LLM node and raises StageFailed on error; stream_prompt, if
+    # given, is its async-generator counterpart yielding deltas, used by astream. memo_scope(name,
+    # node), if given, returns anything else a prompt node's output depends on, such as the model it
+    # is routed to, and becomes part of its memo key. Everything else, ordering, concurrency and
+    # memoization, happens here
+    def __init__(self, graph, run_prompt, memo_size=512, stream_prompt=None, memo_scope=None):
+        self.graph = graph
+        self.run_prompt = run_prompt
+        self.stream_prompt = stream_prompt
+        self.memo_scope = memo_scope
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        for name, node in graph.items():
+            if ("prompt" in node) == ("merge" in node):
+                raise ValueError(f"Stage {name} needs exactly one of prompt or merge")
+        self.order(*graph)
+
+    def order(self, *targets):
+        # Dependencies first; raises on cycles
+        ordered = []
+        visiting = set()
+
+        def visit(name):
+            if name in ordered or name not in self.graph:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage graph has a cycle through {name}")
+            visiting.add(name)
+            for dependency in self.graph[name]["inputs"]:
+                visit(dependency)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for target in targets:
+            visit(target)
+        return ordered
+
+    def external_inputs(self, target):
+        return sorted({
+            dependency for name in self.order(target) for dependency in self.graph[name]["inputs"]
+            if dependency not in self.graph
+        })
+
+    def _memo_key(self, name, values):
+        node = self.graph[name]
+        scope = self.memo_scope(name, node) if self.memo_scope and "prompt" in node else None
+        payload = json.dumps([name, node, values, scope], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _stream_node(self, name, node, values, use_cache, feed):
+        async for delta in self.stream_prompt(name, node, values, use_cache):
+            feed["deltas"].append(delta)
+            feed["changed"].set()
+        return "".join(feed["deltas"])
+
+    async def _run_node(self, name, dependencies, results, use_cache, feeds):
+        await asyncio.gather(*dependencies)
+        node = self.graph[name]
+        values = {dependency: results[dependency] for dependency in node["inputs"]}
+        key = self._memo_key(name, values)
+        if use_cache and key in self._memo:
+            self._memo.move_to_end(key)
+            metrics.inc("sdlc_stage_graph_nodes_total", node=name, outcome="memoized")
+            results[name] = self._memo[key]
+            return results[name]
+        if "merge" in node:
+            output = MERGES[node["merge"]]([values[dependency] for dependency in node["inputs"]])
+        elif feeds is not None and self.stream_prompt is not None:
+            output = await self._stream_node(name, node, values, use_cache, self._feed(feeds, name))
+        else:
+            output = await self.run_prompt(name, node, values, use_cache)
+        metrics.inc("sdlc_stage_graph_nodes_total", node=name, outcome="ran")
+        # Failed nodes raise before this point, so only good outputs are ever memoized
+        self._memo[key] = output
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        results[name] = output
+        return output
+
+    def _feed(self, feeds, name):
+        return feeds.setdefault(name, {"deltas": [], "changed": asyncio.Event()})
+
+    def _schedule(self, name, results, tasks, use_cache, feeds=None):
+        if name not in tasks:
+            dependencies = [
+                self._schedule(dependency, results, tasks, use_cache, feeds)
+                for dependency in self.graph[name]["inputs"] if dependency in self.graph
+            ]
+            tasks[name] = asyncio.ensure_future(self._run_node(name, dependencies, results, use_cache, feeds))
+            if feeds is not None:
+                # Wakes a follower however the node ends: streamed, memoized, merged or failed
+                feed = self._feed(feeds, name)
+                tasks[name].add_done_callback(lambda _: feed["changed"].set())
+        return tasks[name]
+
+    def _start(self, target, inputs):
+        missing = [name for name in self.external_inputs(target) if name not in inputs]
+        if missing:
+            raise ValueError(f"Stage {target} is missing inputs: {', '.join(missing)}")
+        return dict(inputs), {}
+
+    def _stop(self, tasks):
+        # A failed node leaves its siblings running and their results unread
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()
+
+    async def run(self, target, inputs, use_cache=True):
+        results, tasks = self._start(target, inputs)
+        try:
+            return await self._schedule(target, results, tasks, use_cache)
+        finally:
+            self._stop(tasks)
+
+    async def _follow(self, task, feed):
+        # Yields a streaming node's deltas, buffered and then live, until its task is done
+        index = 0
+        while True:
+            while index < len(feed["deltas"]):
+                yield feed["deltas"][index]
+                index += 1
+            if task.done():
+                return
+            feed["changed"].clear()
+            await feed["changed"].wait()
+
+    async def astream(self, target, inputs, use_cache=True):
+        # For a concat target: yields the merged text in document order. The part at the head of
+        # the document streams its deltas as they arrive, while later parts are generated
+        # alongside it and are written out as soon as everything before them is
+        node = self.graph[target]
+        if node.get("merge") != "concat":
+            yield await self.run(target, inputs, use_cache)
+            return
+        results, tasks = self._start(target, inputs)
+        feeds = {}
+        try:
+            parts = [
+                self._schedule(name, results, tasks, use_cache, feeds) if name in self.graph else None
+                for name in node["inputs"]
+            ]
+            written = False
+            for name, part in zip(node["inputs"], parts):
+                # Deltas are trimmed as they pass, so the stream adds up to exactly the merged text
+                pending = ""
+                started = False
+                if part is not None:
+                    async for delta in self._follow(part, self._feed(feeds, name)):
+                        pending += delta
+                        if not started:
+                            pending = pending.lstrip()
+                        if pending.strip():
+                            body = pending.rstrip()
+                            yield ("\n\n" if written and not started else "") + body
+                            pending = pending[len(body):]
+                            started = written = True
+                text = (await part if part is not None else results[name]).strip()
+                if not started and text:
+                    # Memoized parts, external inputs and the odd non-streamed node arrive whole
+                    yield ("\n\n" if written else "") + text
+                    written = True
+            await self._schedule(target, results, tasks, use_cache, feeds)
+        finally:
+            self._stop(tasks)
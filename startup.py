@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+
+from metrics import log_event, metrics
+
+
+class StartupTracker:
+    # Timeline from process import to "able to serve", exposed on /readyz and in the logs
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready_after = None
+        self._last = self.started
+
+    def checkpoint(self, name):
+        # Everything since the previous phase or checkpoint is attributed to this one
+        self._record(name, time.perf_counter() - self._last)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    def _record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self._last = time.perf_counter()
+        metrics.observe("sdlc_startup_phase_seconds", seconds, phase=name)
+
+    @property
+    def ready(self):
+        return self.ready_after is not None
+
+    def mark_ready(self):
+        if self.ready_after is None:
+            self.ready_after = time.perf_counter() - self.started
+            log_event("startup", **self.report())
+            print(self.format_report())
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "ready_after_s": round(self.ready_after, 3) if self.ready else None,
+            "uptime_s": round(time.perf_counter() - self.started, 3),
+            "phases_s": {name: round(seconds, 4) for name, seconds in self.phases.items()}
+        }
+
+    def format_report(self):
+        lines = [f"Startup: ready after {self.ready_after:.2f}s" if self.ready else "Startup: not ready"]
+        lines.extend(f"  {name:<16} {seconds * 1000:8.1f} ms" for name, seconds in self.phases.items())
+        return "\n".join(lines)
+
+
+startup = StartupTracker()
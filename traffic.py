@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+
+def request_key(request):
+    # Identifies an API call by what the model sees; stream and timeout do not change the answer
+    payload = json.dumps([request.get("model"), request.get("messages"), request.get("temperature"),
+                          request.get("max_tokens")])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_continuation(request):
+    return any(message["role"] == "assistant" for message in request.get("messages", []))
+
+
+class ReplayObject(dict):
+    # Same shape as the openai objects AIHelper reads: attribute access plus dict .get()
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class TrafficClient:
+    def client(self, stage):
+        # Shaped like the openai module as far as AIHelper uses it
+        return ReplayObject(ChatCompletion=ReplayObject(
+            acreate=lambda stream=False, **request: self._acreate(stage, stream, request)
+        ))
+
+
+class TrafficRecorder(TrafficClient):
+    # Stands in for the openai module: every ChatCompletion call goes to the real API and the
+    # exchange is appended to a JSON-lines log, one compact line per call
+    offline = False
+
+    def __init__(self, path, openai_loader):
+        self.path = path
+        self.openai_loader = openai_loader
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _write(self, stage, request, start, content, finish_reason=None, usage=None, chunks=None, error=None):
+        entry = {
+            "key": request_key(request), "stage": stage, "model": request.get("model"),
+            "continuation": is_continuation(request), "at": time.time(),
+            "duration_s": round(time.perf_counter() - start, 4), "content": content,
+            "finish_reason": finish_reason, "usage": usage, "chunks": chunks, "error": error
+        }
+        line = json.dumps({key: value for key, value in entry.items() if value is not None}, separators=(",", ":"))
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+        metrics.inc("sdlc_traffic_exchanges_total", mode="record", stage=stage, result="recorded")
+
+    def _record_response(self, stage, request, start, response):
+        choice = response.choices[0]
+        self._write(stage, request, start, choice.message.content, choice.get("finish_reason"),
+                    dict(response.get("usage") or {}))
+        return response
+
+    async def _acreate(self, stage, stream, request):
+        start = time.perf_counter()
+        try:
+            response = await self.openai_loader().ChatCompletion.acreate(stream=stream, **request)
+        except Exception as e:
+            self._write(stage, request, start, None, error=f"{type(e).__name__}: {e}")
+            raise
+        if stream:
+            return self._arecord_stream(stage, request, start, response)
+        return self._record_response(stage, request, start, response)
+
+    async def _arecord_stream(self, stage, request, start, response):
+        chunks = []
+        finish_reason = None
+        try:
+            async for chunk in response:
+                choice = chunk.choices[0]
+                finish_reason = choice.get("finish_reason") or finish_reason
+                delta = choice.delta.get("content")
+                if delta:
+                    # Offsets from the start of the call, so replay reproduces time to first token too
+                    chunks.append([round(time.perf_counter() - start, 4), delta])
+                yield chunk
+        finally:
+            self._write(stage, request, start, "".join(delta for _, delta in chunks), finish_reason, chunks=chunks)
+
+
+class TrafficReplayer(TrafficClient):
+    # Stands in for the openai module without touching the network: answers each call from a
+    # recorded log, with the recorded latency (and chunk timing) times latency_scale. Calls whose
+    # exact request was not recorded get the stage's recorded answers in turn when match="stage",
+    # so sessions still replay after prompt changes; with match="key" they fail
+    offline = True
+
+    def __init__(self, path, latency_scale=1.0, match="stage"):
+        self.latency_scale = latency_scale
+        self.match = match
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_stage = {}
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                # Failed calls are kept in the log for inspection; the retry that followed is replayed
+                if "error" in entry:
+                    continue
+                self._by_key.setdefault(entry["key"], deque()).append(entry)
+                self._by_stage.setdefault((entry["stage"], entry["continuation"]), deque()).append(entry)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._by_key.values())
+
+    def _take(self, stage, request):
+        with self._lock:
+            entries = self._by_key.get(request_key(request))
+            match = "key"
+            if not entries and self.match == "stage":
+                entries = self._by_stage.get((stage, is_continuation(request)))
+                match = "stage"
+            if not entries:
+                metrics.inc("sdlc_traffic_exchanges_total", mode="replay", stage=stage, result="miss")
+                raise LookupError(f"No recorded response for this {stage} request")
+            entry = entries[0]
+            # Cycle through repeats, so a log can be replayed any number of times
+            entries.rotate(-1)
+        metrics.inc("sdlc_traffic_exchanges_total", mode="replay", stage=stage, result=match)
+        return entry
+
+    def _response(self, entry):
+        return ReplayObject(
+            choices=[ReplayObject(
+                message=ReplayObject(role="assistant", content=entry["content"]),
+                finish_reason=entry.get("finish_reason")
+            )],
+            usage=entry.get("usage") or {}
+        )
+
+    def _chunks(self, entry):
+        # Yields (delay before the chunk, chunk); responses recorded without streaming arrive whole
+        chunks = entry.get("chunks") or [[entry["duration_s"], entry["content"]]]
+        previous = 0.0
+        for index, (offset, delta) in enumerate(chunks):
+            finish_reason = entry.get("finish_reason") if index == len(chunks) - 1 else None
+            yield (offset - previous) * self.latency_scale, ReplayObject(
+                choices=[ReplayObject(delta=ReplayObject(content=delta), finish_reason=finish_reason)]
+            )
+            previous = offset
+
+    async def _acreate(self, stage, stream, request):
+        entry = self._take(stage, request)
+        if stream:
+            return self._astream(entry)
+        await asyncio.sleep(entry["duration_s"] * self.latency_scale)
+        return self._response(entry)
+
+    async def _astream(self, entry):
+        for delay, chunk in self._chunks(entry):
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk
+
+
+def create_traffic(mode, path, openai_loader, latency_scale=1.0, match="stage"):
+    if mode == "record":
+        return TrafficRecorder(path, openai_loader)
+    if mode == "replay":
+        return TrafficReplayer(path, latency_scale, match)
+    if mode not in ("", "off"):
+        raise ValueError(f"Unknown traffic mode: {mode}")
+    return None